@@ -0,0 +1,271 @@
+class AllDifferentConstraint:
+    """
+    Constraint of unique values of variables, shared by rows of futoshiki and skyscrapper
+    """
+
+    def __init__(self, vars_, strength='value'):
+        """
+        Create row constraint where every value must be unique
+
+        :param vars_:       Variables in row
+        :param strength:    Strength of filtering:
+                                        value       - remove values of assigned variables
+                                        matching    - remove values not belonging to any maximum matching
+        """
+        self.vars_ = vars_
+        self.strength = strength
+
+        # Purge removes values depending only on the purged variable
+        self.local_purge = strength == 'value'
+
+        self.reset()
+
+    def reset(self):
+        """
+        Restore state from before the search, values are counted from current assignment of variables
+        """
+        self.weight = 1
+        self.matching = [0] * len(self.vars_)
+
+        # Occurrences of every value among assigned variables and number of values occurring more than once
+        self.counts = [0] * (len(self.vars_) + 1)
+        self.repeated = 0
+        for var in self.vars_:
+            if var.value is not None:
+                self.assign(var.value)
+
+    def assign(self, value):
+        """
+        Count value assigned to variable in row
+
+        :param value:   Assigned value
+        """
+        self.counts[value] += 1
+        if self.counts[value] == 2:
+            self.repeated += 1
+
+    def unassign(self, value):
+        """
+        Stop counting value removed from variable in row
+
+        :param value:   Removed value
+        """
+        if self.counts[value] == 2:
+            self.repeated -= 1
+        self.counts[value] -= 1
+
+    def check(self):
+        """
+        Check if constraint is meet
+
+        :return: If constraint is meet
+        """
+        return not self.repeated
+
+    def purge(self, var):
+        """
+        Remove all values not meeting constraint from other variables domains
+
+        :param var:     Variable to purge for
+
+        :return:    If all domains are left with at least one value
+        """
+        valid_domains = True
+
+        for row_var in self.vars_:
+            if row_var is not var and row_var.value is None:
+                row_var.remove_value(var.value)
+                if row_var.value is None and not row_var.domain_size:
+                    valid_domains = False
+
+        if valid_domains and self.strength == 'matching':
+            valid_domains = filter_all_different(self.vars_, self.matching)
+
+        return valid_domains
+
+    def propagate(self):
+        """
+        Remove values of assigned and single valued variables from other variables domains until nothing changes
+
+        :return:    If all domains are left with at least one value and no value is repeated
+        """
+        changed = True
+        while changed:
+            changed = False
+
+            # Collect values which are already taken
+            taken = 0
+            for row_var in self.vars_:
+                if row_var.value is not None:
+                    bit = 1 << row_var.value
+                elif row_var.domain & (row_var.domain - 1) == 0:
+                    bit = row_var.domain
+                else:
+                    continue
+                if taken & bit:
+                    return False
+                taken |= bit
+
+            for row_var in self.vars_:
+                domain = row_var.domain
+                if row_var.value is None and domain & (domain - 1):
+                    row_var.filter_domain(~taken)
+                    if not row_var.domain_size:
+                        return False
+                    if row_var.domain_size == 1:
+                        changed = True
+
+        if self.strength == 'matching':
+            return filter_all_different(self.vars_, self.matching)
+
+        return True
+
+
+def filter_all_different(vars_, matching):
+    """
+    Remove values which do not belong to any maximum matching between variables and values (Regin)
+
+    Matching edges are directed from variables to values, other edges from values to variables. Edge is kept if it
+    is matched, lies on a path starting at a free value or connects vertices of the same strongly connected
+    component.
+
+    :param vars_:       Variables which must have different values
+    :param matching:    List of values matched to variables in previous call, updated in place
+
+    :return:    If all variables can get different values
+    """
+    domains = [1 << var.value if var.value is not None else var.domain for var in vars_]
+
+    # Keep still valid part of previous matching
+    matched = dict()
+    for i, value in enumerate(matching):
+        if value and domains[i] >> value & 1 and value not in matched:
+            matched[value] = i
+        else:
+            matching[i] = 0
+
+    for i in range(len(vars_)):
+        if not matching[i] and not _augment(i, domains, matching, matched, set()):
+            return False
+
+    # Values are numbered after variables in graph
+    size = len(vars_)
+    all_values = 0
+    for domain in domains:
+        all_values |= domain
+    graph = [[size + matching[i]] for i in range(size)] + [[] for _ in range(all_values.bit_length())]
+    for i, domain in enumerate(domains):
+        for value in _values(domain):
+            if value != matching[i]:
+                graph[size + value].append(i)
+
+    # Vertices reachable from free values
+    reachable = set()
+    stack = [size + value for value in _values(all_values) if value not in matched]
+    while stack:
+        vertex = stack.pop()
+        if vertex not in reachable:
+            reachable.add(vertex)
+            stack.extend(graph[vertex])
+
+    components = _components(graph)
+
+    for i, var in enumerate(vars_):
+        if var.value is None:
+            mask = 1 << matching[i]
+            for value in _values(domains[i]):
+                if size + value in reachable or components[size + value] == components[i]:
+                    mask |= 1 << value
+            var.filter_domain(mask)
+
+    return True
+
+
+def _values(domain):
+    """
+    Iterate over values of domain bitmask
+
+    :param domain:  Bitmask of values
+
+    :return:    Generator of values in ascending order
+    """
+    while domain:
+        low_bit = domain & -domain
+        yield low_bit.bit_length() - 1
+        domain ^= low_bit
+
+
+def _augment(i, domains, matching, matched, visited):
+    """
+    Find augmenting path starting at variable and flip it
+
+    :param i:           Index of variable
+    :param domains:     Domains of variables
+    :param matching:    List of values matched to variables
+    :param matched:     Dictionary of value: index of variable it is matched to
+    :param visited:     Set of values already visited by the search
+
+    :return:    If variable was matched
+    """
+    for value in _values(domains[i]):
+        if value not in visited:
+            visited.add(value)
+            if value not in matched or _augment(matched[value], domains, matching, matched, visited):
+                matching[i] = value
+                matched[value] = i
+                return True
+
+    return False
+
+
+def _components(graph):
+    """
+    Find strongly connected components of directed graph (iterative Tarjan)
+
+    :param graph:   List of successors of every vertex
+
+    :return:    List of component identifiers of every vertex
+    """
+    index = [-1] * len(graph)
+    low = [0] * len(graph)
+    components = [-1] * len(graph)
+    on_stack = [False] * len(graph)
+    stack = []
+    counter = 0
+    component = 0
+
+    for root in range(len(graph)):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        while work:
+            vertex, edge = work.pop()
+            if edge == 0:
+                index[vertex] = low[vertex] = counter
+                counter += 1
+                stack.append(vertex)
+                on_stack[vertex] = True
+            elif edge <= len(graph[vertex]):
+                # Returned from successor
+                low[vertex] = min(low[vertex], low[graph[vertex][edge - 1]])
+
+            while edge < len(graph[vertex]):
+                successor = graph[vertex][edge]
+                edge += 1
+                if index[successor] == -1:
+                    work.append((vertex, edge))
+                    work.append((successor, 0))
+                    break
+                elif on_stack[successor]:
+                    low[vertex] = min(low[vertex], index[successor])
+            else:
+                if low[vertex] == index[vertex]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        components[member] = component
+                        if member == vertex:
+                            break
+                    component += 1
+
+    return components
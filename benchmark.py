@@ -0,0 +1,185 @@
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+from itertools import product
+from time import perf_counter
+
+from scp import SCP
+
+METHODS = ['back', 'forward', 'mac']
+ORDERS = ['none', 'max_dom', 'min_dom', 'max_con', 'min_con', 'dom_wdeg']
+
+
+def problem_size(file_path):
+    """
+    Read size of problem from the first line of data file
+
+    :param file_path:   Path to data file
+
+    :return:    Size of problem
+    """
+    with open(file_path) as f:
+        return int(f.readline())
+
+
+def measure(scp, repeat, warmup):
+    """
+    Solve loaded problem several times, resetting it before every run
+
+    :param scp:     Loaded SCP engine, reset to configuration before measurement
+    :param repeat:  Number of measured runs
+    :param warmup:  Number of runs done before measurement
+
+    :return:    Tuple (list of run times, returns, validations)
+    """
+    times = []
+    for i in range(warmup + repeat):
+        scp.reset()
+        start = perf_counter()
+        scp.run()
+        delta = perf_counter() - start
+        if i >= warmup:
+            times.append(delta)
+
+    return times, scp.returns, scp.validations
+
+
+def summarize(times):
+    """
+    Get median and interquartile range of run times
+
+    :param times:   List of run times
+
+    :return:    Tuple (median, IQR)
+    """
+    if len(times) < 2:
+        return times[0], 0.0
+
+    q1, _, q3 = statistics.quantiles(times, n=4, method='inclusive')
+
+    return statistics.median(times), q3 - q1
+
+
+def run_suite(files, methods, orders, dynamics, repeat, warmup):
+    """
+    Benchmark every file with every configuration
+
+    :param files:       List of paths to data files
+    :param methods:     List of solving methods
+    :param orders:      List of ordering methods
+    :param dynamics:    List of dynamic ordering flags
+    :param repeat:      Number of measured runs of every case
+    :param warmup:      Number of runs done before measurement of every case
+
+    :return:    Dictionary of case name: dictionary of median, iqr, returns and validations
+    """
+    results = dict()
+    for file_path in files:
+        scp = SCP()
+        if not scp.load_data(file_path):
+            print(f'Could not load {file_path}')
+            continue
+
+        for method, order, dynamic in product(methods, orders, dynamics):
+            scp.reset(method=method, order=order, dynamic_ordering=dynamic)
+            times, returns, validations = measure(scp, repeat, warmup)
+            median, iqr = summarize(times)
+
+            case = f'{file_path}|{method}|{order}|{int(dynamic)}'
+            results[case] = {
+                'median': median,
+                'iqr': iqr,
+                'returns': returns,
+                'validations': validations
+            }
+            print(f'{case:<45} median {median:9.4f}s  IQR {iqr:8.4f}s  returns {returns:>9}  '
+                  f'validations {validations:>10}', flush=True)
+
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """
+    Find cases slower than baseline or doing more search work
+
+    Time counts as regression only when median grows by more than tolerance and by more than min_delta seconds,
+    so very short runs do not fail on timer noise. Returns and validations are deterministic, any growth counts.
+
+    :param results:     Dictionary of case name: measured values
+    :param baseline:    Dictionary of case name: baseline values
+    :param tolerance:   Allowed relative growth of median time
+    :param min_delta:   Allowed absolute growth of median time in seconds
+
+    :return:    List of regression descriptions
+    """
+    regressions = []
+    for case, result in results.items():
+        if case not in baseline:
+            continue
+        base = baseline[case]
+
+        growth = result['median'] - base['median']
+        if growth > base['median'] * tolerance and growth > min_delta:
+            regressions.append(f'{case}: median {base["median"]:.4f}s -> {result["median"]:.4f}s')
+        for counter in ('returns', 'validations'):
+            if result[counter] > base[counter]:
+                regressions.append(f'{case}: {counter} {base[counter]} -> {result[counter]}')
+
+    return regressions
+
+
+def main(argv=None):
+    """
+    Run benchmark suite from command line
+
+    :param argv:    Command line arguments, sys.argv if None
+
+    :return:    Exit code, 1 if any regression was found
+    """
+    parser = argparse.ArgumentParser(description='Benchmark SCP engine over data files')
+    parser.add_argument('--files', nargs='+', default=['test_data/*.txt', 'train_data/*.txt'],
+                        help='glob patterns of data files')
+    parser.add_argument('--max-size', type=int, default=6, help='skip problems larger than this, 0 for no limit')
+    parser.add_argument('--methods', nargs='+', default=METHODS, choices=METHODS)
+    parser.add_argument('--orders', nargs='+', default=ORDERS, choices=ORDERS)
+    parser.add_argument('--dynamic', nargs='+', default=['0', '1'], choices=['0', '1'],
+                        help='dynamic ordering flags to test')
+    parser.add_argument('--repeat', type=int, default=5, help='measured runs of every case')
+    parser.add_argument('--warmup', type=int, default=1, help='runs before measurement of every case')
+    parser.add_argument('--baseline', help='JSON file with baseline to compare with')
+    parser.add_argument('--save', help='JSON file to save results to')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative growth of median time')
+    parser.add_argument('--min-delta', type=float, default=0.005, help='allowed absolute growth of median time')
+    args = parser.parse_args(argv)
+
+    files = sorted({path for pattern in args.files for path in glob.glob(pattern)
+                    if os.path.basename(path).lower() != 'readme.txt'})
+    if args.max_size:
+        files = [path for path in files if problem_size(path) <= args.max_size]
+
+    results = run_suite(files, args.methods, args.orders, [d == '1' for d in args.dynamic], args.repeat,
+                        args.warmup)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'repeat': args.repeat, 'warmup': args.warmup, 'cases': results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['cases']
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f'{len(regressions)} regressions:')
+            for regression in regressions:
+                print(regression)
+            return 1
+        print('No regressions')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
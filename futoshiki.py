@@ -1,65 +1,20 @@
-class FutoshikiRowConstraint:
+from alldiff import AllDifferentConstraint
+
+
+class FutoshikiRowConstraint(AllDifferentConstraint):
     """
     Constraint of row integrity in futoshiki
     """
 
-    def __init__(self, vars_):
-        """
-        Create row constraint where every value must be unique
-
-        :param vars_:   Variables in row
-        """
-        self.vars_ = vars_
-
-    def check(self):
-        """
-        Check if constraint is meet
-
-        :return: If constraint is meet
-        """
-        # Filter out Nones
-        set_values = [v.value for v in self.vars_ if v.value is not None]
-
-        return len(set_values) == len(set(set_values))
-
-    def purge(self, var):
-        """
-        Remove all values not meeting constraint from other variables domains
-
-        :param var:     Variable to purge for
-
-        :return:    If all domains are left with at least one value
-        """
-        valid_domains = True
-
-        def predicate(x):
-            return x != var.value
-
-        for row_var in self.vars_:
-            if row_var != var and row_var.value is None:
-                row_var.push_state()
-                row_var.filter_domain(predicate)
-                if row_var.value is None and not row_var.domain_size:
-                    valid_domains = False
-
-        return valid_domains
-
-    def reverse_purge(self, var):
-        """
-        Reverse states of variables changed with given variable purge
-
-        :param var: Variable which purge will be reversed
-        """
-        for row_var in self.vars_:
-            if row_var != var and row_var.value is None:
-                row_var.pop_state()
-
 
 class FutoshikiRelationConstraint:
     """
     Constraint of relation in futoshiki
     """
 
+    # Purge removes values depending only on the purged variable
+    local_purge = True
+
     def __init__(self, var1, var2):
         """
         Create relation constraint with 2 variables, where v1 < v2
@@ -69,6 +24,14 @@ class FutoshikiRelationConstraint:
         """
         self.var1 = var1
         self.var2 = var2
+        self.vars_ = [var1, var2]
+        self.weight = 1
+
+    def reset(self):
+        """
+        Restore state from before the search
+        """
+        self.weight = 1
 
     def check(self):
         """
@@ -93,33 +56,47 @@ class FutoshikiRelationConstraint:
         if self.var1 == self.var2:
             valid_domains = False
         elif var == self.var1 and self.var2.value is None:
-
-            def predicate(x):
-                return x > var.value
-
-            self.var2.push_state()
-            self.var2.filter_domain(predicate)
+            # Keep only values greater than var value
+            self.var2.filter_domain(-1 << (var.value + 1))
             if self.var2.value is None and not self.var2.domain_size:
                 valid_domains = False
         elif var == self.var2 and self.var1.value is None:
-
-            def predicate(x):
-                return x < var.value
-
-            self.var1.push_state()
-            self.var1.filter_domain(predicate)
+            # Keep only values lower than var value
+            self.var1.filter_domain((1 << var.value) - 1)
             if self.var1.value is None and not self.var1.domain_size:
                 valid_domains = False
 
         return valid_domains
 
-    def reverse_purge(self, var):
+    def propagate(self):
         """
-        Reverse states of variables changed with given variable purge
+        Remove values of both variables which can not meet relation with any value of the other one
 
-        :param var: Variable which purge will be reversed
+        :return:    If all domains are left with at least one value
         """
-        if var == self.var1 and self.var2.value is None:
-            self.var2.pop_state()
-        elif var == self.var2 and self.var1.value is None:
-            self.var1.pop_state()
+        if self.var1 == self.var2:
+            return False
+
+        if self.var1.value is not None:
+            low = self.var1.value
+        elif self.var1.domain:
+            low = self.var1.min_value
+        else:
+            return False
+
+        if self.var2.value is not None:
+            high = self.var2.value
+        elif self.var2.domain:
+            high = self.var2.max_value
+        else:
+            return False
+
+        if low >= high:
+            return False
+
+        if self.var1.value is None:
+            self.var1.filter_domain((1 << high) - 1)
+        if self.var2.value is None:
+            self.var2.filter_domain(-1 << (low + 1))
+
+        return True
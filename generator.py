@@ -0,0 +1,290 @@
+import argparse
+import os
+import random
+import tempfile
+
+from scp import SCP
+
+# Configuration of SCP used to count solutions of generated puzzles
+COUNTING_CONFIGURATION = dict(method='mac', order='dom_wdeg', dynamic_ordering=True, alldiff='matching')
+
+
+def latin_square(n, rng, steps=None):
+    """
+    Create random latin square with Jacobson-Matthews Markov chain
+
+    Square is an incidence cube with cell (row, col, symbol) set to 1 when symbol is in cell. Every step moves values
+    around a 2x2x2 subcube, which may leave one cell at -1 (improper square) until the next step. The chain starts
+    from shuffled cyclic square and its stationary distribution is uniform over all latin squares, while shuffling
+    alone gives only squares isotopic to the cyclic one. After given number of steps the square is checked every n
+    squared steps and returned once it is proper, stopping at the first proper square would favour some of them.
+
+    :param n:       Size of square
+    :param rng:     Random generator
+    :param steps:   Minimal number of chain steps, defaults to n cubed
+
+    :return:    List of rows of values from 1 to n
+    """
+    if steps is None:
+        steps = n ** 3
+
+    # Cells of the cube set to 1 on every line, lines through the improper cell have two of them
+    cube = dict()
+    rows = [[set() for _ in range(n)] for _ in range(n)]  # column, symbol: rows
+    cols = [[set() for _ in range(n)] for _ in range(n)]  # row, symbol: columns
+    symbols = [[set() for _ in range(n)] for _ in range(n)]  # row, column: symbols
+
+    def change(r, c, s, delta):
+        old = cube.get((r, c, s), 0)
+        cube[(r, c, s)] = old + delta
+        if old == 1:
+            rows[c][s].discard(r)
+            cols[r][s].discard(c)
+            symbols[r][c].discard(s)
+        elif old + delta == 1:
+            rows[c][s].add(r)
+            cols[r][s].add(c)
+            symbols[r][c].add(s)
+
+    row_order = rng.sample(range(n), n)
+    col_order = rng.sample(range(n), n)
+    symbol_order = rng.sample(range(n), n)
+    for r in range(n):
+        for c in range(n):
+            change(row_order[r], col_order[c], symbol_order[(r + c) % n], 1)
+
+    improper = None
+    step = 0
+    while n > 1 and (step < steps or improper is not None or step % (n * n)):
+        step += 1
+        if improper is None:
+            # Random cell without given symbol, every line through it has single 1
+            r, c = rng.randrange(n), rng.randrange(n)
+            s2, = symbols[r][c]
+            s = rng.randrange(n - 1)
+            s += s >= s2
+            r2, = rows[c][s]
+            c2, = cols[r][s]
+        else:
+            r, c, s = improper
+            r2 = rng.choice(tuple(rows[c][s]))
+            c2 = rng.choice(tuple(cols[r][s]))
+            s2 = rng.choice(tuple(symbols[r][c]))
+
+        for r_, c_, s_ in ((r, c, s), (r, c2, s2), (r2, c, s2), (r2, c2, s)):
+            change(r_, c_, s_, 1)
+        for r_, c_, s_ in ((r, c, s2), (r, c2, s), (r2, c, s), (r2, c2, s2)):
+            change(r_, c_, s_, -1)
+
+        improper = (r2, c2, s2) if cube[(r2, c2, s2)] < 0 else None
+
+    return [[next(iter(symbols[r][c])) + 1 for c in range(n)] for r in range(n)]
+
+
+def futoshiki_text(grid, givens, relations):
+    """
+    Create futoshiki file content
+
+    :param grid:        Solution as list of rows
+    :param givens:      Set of (row, col) cells with visible values
+    :param relations:   List of pairs of cells ((row, col), (row, col)), first cell has lower value
+
+    :return:    File content
+    """
+    n = len(grid)
+    lines = [str(n), 'START:']
+    for i in range(n):
+        lines.append(';'.join(str(grid[i][j]) if (i, j) in givens else '0' for j in range(n)))
+    lines.append('REL:')
+    for (row1, col1), (row2, col2) in relations:
+        lines.append(f'{chr(65 + row1)}{col1 + 1};{chr(65 + row2)}{col2 + 1}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def skyscrapper_text(grid, clues):
+    """
+    Create skyscrapper file content
+
+    :param grid:    Solution as list of rows
+    :param clues:   Set of (side, index) clues which are visible, side is one of G, D, L, P
+
+    :return:    File content
+    """
+    n = len(grid)
+    all_clues = skyscrapper_clues(grid)
+    lines = [str(n)]
+    for side in 'GDLP':
+        lines.append(';'.join([side] + [str(all_clues[side][i]) if (side, i) in clues else '0' for i in range(n)]))
+
+    return '\n'.join(lines) + '\n'
+
+
+def skyscrapper_clues(grid):
+    """
+    Count buildings visible from every side of solution
+
+    :param grid:    Solution as list of rows
+
+    :return:    Dictionary of side: list of visible buildings, columns for G and D, rows for L and P
+    """
+    n = len(grid)
+    columns = [[grid[r][c] for r in range(n)] for c in range(n)]
+
+    return {
+        'G': [_visible(column) for column in columns],
+        'D': [_visible(column[::-1]) for column in columns],
+        'L': [_visible(row) for row in grid],
+        'P': [_visible(row[::-1]) for row in grid]
+    }
+
+
+def _visible(heights):
+    """
+    Count buildings visible from the start of row
+
+    :param heights: Heights of buildings in row
+
+    :return:    Number of visible buildings
+    """
+    visible = 0
+    tallest = 0
+    for height in heights:
+        if height > tallest:
+            visible += 1
+            tallest = height
+
+    return visible
+
+
+def find_solutions(text, type_, limit=2):
+    """
+    Solve puzzle given as file content
+
+    :param text:    File content
+    :param type_:   Type of problem, futo or sky
+    :param limit:   Maximal number of solutions to look for
+
+    :return:    List of found solutions
+    """
+    fd, path = tempfile.mkstemp(suffix='.txt', prefix=f'{type_}_')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        scp = SCP(**COUNTING_CONFIGURATION)
+        if not scp.load_data(path, type_):
+            return []
+        return list(scp.iter_solutions(limit))
+    finally:
+        os.remove(path)
+
+
+def generate_futoshiki(n, givens=0, relation_density=0.3, unique=False, rng=None):
+    """
+    Generate futoshiki puzzle
+
+    Relations are placed between random pairs of neighbouring cells. If unique solution is required, cells where
+    two found solutions differ are revealed until only one solution is left.
+
+    :param n:                   Size of puzzle
+    :param givens:              Number of cells with visible value
+    :param relation_density:    Fraction of neighbouring cell pairs with relation
+    :param unique:              If puzzle must have exactly one solution
+    :param rng:                 Random generator
+
+    :return:    File content
+    """
+    rng = rng or random.Random()
+    grid = latin_square(n, rng)
+
+    cells = [(i, j) for i in range(n) for j in range(n)]
+    shown = set(rng.sample(cells, min(givens, len(cells))))
+
+    pairs = [((i, j), (i, j + 1)) for i in range(n) for j in range(n - 1)] + \
+            [((i, j), (i + 1, j)) for i in range(n - 1) for j in range(n)]
+    relations = []
+    for cell1, cell2 in rng.sample(pairs, round(relation_density * len(pairs))):
+        if grid[cell1[0]][cell1[1]] > grid[cell2[0]][cell2[1]]:
+            cell1, cell2 = cell2, cell1
+        relations.append((cell1, cell2))
+
+    text = futoshiki_text(grid, shown, relations)
+    while unique:
+        solutions = find_solutions(text, 'futo')
+        if len(solutions) < 2:
+            break
+        different = [(i, j) for i, j in cells if solutions[0][i][j] != solutions[1][i][j]]
+        shown.add(rng.choice(different))
+        text = futoshiki_text(grid, shown, relations)
+
+    return text
+
+
+def generate_skyscrapper(n, clue_density=0.5, unique=False, rng=None):
+    """
+    Generate skyscrapper puzzle
+
+    If unique solution is required, clues which differ between two found solutions are revealed until only one
+    solution is left. When all clues are revealed and solution is still not unique, new solution is drawn.
+
+    :param n:               Size of puzzle
+    :param clue_density:    Fraction of visible clues
+    :param unique:          If puzzle must have exactly one solution
+    :param rng:             Random generator
+
+    :return:    File content
+    """
+    rng = rng or random.Random()
+    all_places = [(side, i) for side in 'GDLP' for i in range(n)]
+
+    while True:
+        grid = latin_square(n, rng)
+        shown = set(rng.sample(all_places, round(clue_density * len(all_places))))
+        text = skyscrapper_text(grid, shown)
+
+        while unique:
+            solutions = find_solutions(text, 'sky')
+            if len(solutions) < 2:
+                return text
+            first, second = (skyscrapper_clues(solution) for solution in solutions)
+            different = [(side, i) for side, i in all_places if first[side][i] != second[side][i]]
+            if not different:
+                break
+            shown.add(rng.choice(different))
+            text = skyscrapper_text(grid, shown)
+        else:
+            return text
+
+
+def main(argv=None):
+    """
+    Generate puzzle from command line
+
+    :param argv:    Command line arguments, sys.argv if None
+    """
+    parser = argparse.ArgumentParser(description='Generate futoshiki or skyscrapper puzzle')
+    parser.add_argument('type', choices=['futo', 'sky'], help='type of puzzle')
+    parser.add_argument('size', type=int, help='size of puzzle')
+    parser.add_argument('--givens', type=int, default=0, help='number of visible futoshiki values')
+    parser.add_argument('--relations', type=float, default=0.3, help='fraction of futoshiki neighbours with relation')
+    parser.add_argument('--clues', type=float, default=0.5, help='fraction of visible skyscrapper clues')
+    parser.add_argument('--unique', action='store_true', help='reveal more until solution is unique')
+    parser.add_argument('--seed', type=int, help='seed of random generator')
+    parser.add_argument('-o', '--output', help='output file, printed if not given')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    if args.type == 'futo':
+        text = generate_futoshiki(args.size, args.givens, args.relations, args.unique, rng)
+    else:
+        text = generate_skyscrapper(args.size, args.clues, args.unique, rng)
+
+    if args.output is None:
+        print(text, end='')
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
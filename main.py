@@ -1,3 +1,6 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
 from itertools import product
 
 from collector import Collector
@@ -20,6 +23,77 @@ def run(file_name, method='back', order='none', dynamic=False, collector=None):
             collector.push_data(file_name, time_delta, returns, evals, scp.method, scp.order, scp.dynamic_ordering)
 
 
+@lru_cache(maxsize=32)
+def load_model(file_name):
+    """
+    Load problem once per process, later configurations reset and solve the same model
+
+    :param file_name:   Name of test file without prefix and extension
+
+    :return:    Loaded SCP or None if data could not be loaded
+    """
+    scp = SCP()
+    if not scp.load_data(f'test_data/test_{file_name}.txt'):
+        return None
+
+    return scp
+
+
+def measure(file_name, method='back', order='none', dynamic=False):
+    """
+    Solve single configuration and return its statistics, used by worker processes of sweep
+
+    :param file_name:   Name of test file without prefix and extension
+    :param method:      Method of solving
+    :param order:       Order of variables
+    :param dynamic:     If order is dynamic
+
+    :return:    Tuple of arguments for Collector.push_data or None if data could not be loaded
+    """
+    scp = load_model(file_name)
+    if scp is None:
+        return None
+
+    scp.reset(method=method, order=order, dynamic_ordering=dynamic)
+    scp.run()
+    time_delta, returns, evals = scp.get_stats()
+
+    return file_name, time_delta, returns, evals, scp.method, scp.order, scp.dynamic_ordering
+
+
+def sweep(configurations, workers=None, collector=None):
+    """
+    Run configurations in pool of worker processes, results are collected in parent as soon as they finish
+
+    Every worker solves one configuration at a time, so with no more workers than available cores runs do not
+    compete for CPU and measured times stay comparable with sequential sweep.
+
+    :param configurations:  Iterable of (file_name, method, order, dynamic) tuples
+    :param workers:         Number of worker processes, defaults to number of available cores
+    :param collector:       Collector receiving results, if None they are printed
+
+    :return:    Number of finished configurations
+    """
+    if workers is None:
+        workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(measure, *configuration) for configuration in configurations]
+        for future in as_completed(futures):
+            result = future.result()
+            if result is None:
+                continue
+            if collector is None:
+                print(*result)
+            else:
+                collector.push_data(*result)
+            done += 1
+            print('.', end='', flush=True)
+
+    return done
+
+
 if __name__ == '__main__':
     postfixes = [f'_{i}_{j}' for i in range(4, 7) for j in range(3)]
     # files = ['futo', 'sky']
@@ -30,14 +104,15 @@ if __name__ == '__main__':
     orders = ['none', 'min_dom', 'max_con']  # TODO min_con, max_dom
     dynamics = [True, False]
 
-    with Collector() as col:
-        for name, postfix in product(files, postfixes):
-            file = name + postfix
-            for method in methods:
-                for order in orders:
-                    for dynamic in dynamics:
-                        run(file, method, order, dynamic, col)
-                        print('.', end='', flush=True)
-            print(f'{file} done')
-
-    print('All DONE')
+    # Number of worker processes, None uses all available cores
+    workers = int(os.environ['SCP_WORKERS']) if 'SCP_WORKERS' in os.environ else None
+
+    files = [name + postfix for name, postfix in product(files, postfixes)]
+
+    # Database backend, sqlite writes to local scp.db file
+    backend = os.environ.get('SCP_BACKEND', 'mysql')
+
+    with Collector(backend=backend) as col:
+        sweep(product(files, methods, orders, dynamics), workers, col)
+
+    print('\nAll DONE')
@@ -0,0 +1,192 @@
+import multiprocessing as mp
+import os
+import time
+from itertools import product
+from math import prod
+from queue import Empty
+
+from scp import SCP
+
+# Configurations raced by default, each one is set of SCP keyword arguments
+PORTFOLIO = [
+    dict(method='forward', order='min_dom', dynamic_ordering=True),
+    dict(method='forward', order='dom_wdeg', dynamic_ordering=True, backjumping=True),
+    dict(method='mac', order='dom_wdeg', dynamic_ordering=True),
+    dict(method='mac', order='min_dom', dynamic_ordering=True, alldiff='matching'),
+]
+
+# Minimal number of subproblems per worker when splitting search tree, more of them balance uneven branches better
+OVERDECOMPOSITION = 16
+
+# Seconds between checks if portfolio workers are still alive
+POLL_INTERVAL = 0.1
+
+
+def _solve(index, file_path, configuration, results):
+    """
+    Solve problem in worker process and send result to parent
+
+    :param index:           Index of configuration in portfolio
+    :param file_path:       Path to problem file
+    :param configuration:   SCP keyword arguments
+    :param results:         Queue receiving (index, solutions, stats), solutions are None if data could not be loaded
+                            or the configuration failed
+    """
+    try:
+        scp = SCP(**configuration)
+        if not scp.load_data(file_path):
+            results.put((index, None, None))
+            return
+
+        scp.run()
+    except Exception as e:
+        print(f'Configuration {configuration} failed: {e!r}')
+        results.put((index, None, None))
+        return
+
+    results.put((index, scp.solutions, scp.get_stats()))
+
+
+def solve_portfolio(file_path, configurations=None, timeout=None):
+    """
+    Race several SCP configurations on the same problem, each in its own process
+
+    First configuration which finishes the search wins, remaining processes are terminated. Finishing without
+    solution counts too, as it proves the problem unsatisfiable. Configurations which fail or whose processes die
+    are dropped from the race.
+
+    :param file_path:       Path to problem file
+    :param configurations:  List of SCP keyword arguments, defaults to PORTFOLIO
+    :param timeout:         Seconds to wait for the winner, None waits forever
+
+    :return:    Tuple (configuration, solutions, (time, returns, evals)) of the winner or None if data could not be
+                loaded, every configuration failed or time ran out
+    """
+    if configurations is None:
+        configurations = PORTFOLIO
+
+    results = mp.Queue()
+    processes = [mp.Process(target=_solve, args=(i, file_path, configuration, results), daemon=True)
+                 for i, configuration in enumerate(configurations)]
+    for process in processes:
+        process.start()
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    failed = set()
+    try:
+        while len(failed) < len(processes):
+            # Results are flushed before process exits, so they are in queue if all processes were dead already
+            alive = any(process.is_alive() for process in processes)
+            try:
+                index, solutions, stats = results.get(timeout=POLL_INTERVAL)
+            except Empty:
+                if not alive:
+                    print('All portfolio workers died')
+                    return None
+                if deadline is not None and time.monotonic() >= deadline:
+                    print('Portfolio timed out')
+                    return None
+                continue
+
+            if solutions is not None:
+                return configurations[index], solutions, stats
+            failed.add(index)
+
+        return None
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+
+def _solve_subproblem(file_path, configuration, assignments):
+    """
+    Find all solutions of subproblem in worker process
+
+    :param file_path:       Path to problem file
+    :param configuration:   SCP keyword arguments
+    :param assignments:     Dictionary of variable position: value fixing the subproblem
+
+    :return:    Tuple (solutions, returns, evals)
+    """
+    scp = SCP(**configuration, all_solutions=True)
+    if not scp.load_data(file_path) or not scp.restrict(assignments):
+        return [], 0, 0
+
+    scp.run()
+    _, returns, evals = scp.get_stats()
+
+    return scp.solutions, returns, evals
+
+
+def split_problem(file_path, subproblems):
+    """
+    Split search tree into subproblems by fixing values of first few variables
+
+    Variables with the smallest domains are split first, until the number of value combinations reaches the
+    requested number of subproblems.
+
+    :param file_path:   Path to problem file
+    :param subproblems: Minimal number of subproblems
+
+    :return:    List of dictionaries of variable position: value or None if data could not be loaded
+    """
+    scp = SCP()
+    if not scp.load_data(file_path):
+        return None
+
+    split_vars = []
+    for var in sorted(scp.call_stack, key=lambda v: v.domain_size):
+        if prod(v.domain_size for v in split_vars) >= subproblems:
+            break
+        split_vars.append(var)
+
+    return [dict(zip((v.id_ for v in split_vars), values)) for values in product(*(v.values for v in split_vars))]
+
+
+def solve_all_parallel(file_path, configuration=None, workers=None):
+    """
+    Find all solutions with search tree split between worker processes
+
+    Subproblems are handed out one by one to whichever worker is idle. There is many more of them than workers, so
+    a worker stuck in large branch is compensated by others taking the remaining small ones.
+
+    :param file_path:       Path to problem file
+    :param configuration:   SCP keyword arguments without all_solutions, defaults to forward checking with min_dom
+    :param workers:         Number of worker processes, defaults to number of available cores
+
+    :return:    Tuple (solutions, returns, evals) merged over all subproblems or None if data could not be loaded
+    """
+    if configuration is None:
+        configuration = PORTFOLIO[0]
+    if workers is None:
+        workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+
+    subproblems = split_problem(file_path, workers * OVERDECOMPOSITION)
+    if subproblems is None:
+        return None
+
+    solutions = []
+    returns = 0
+    evals = 0
+    with mp.Pool(workers) as pool:
+        tasks = [(file_path, configuration, assignments) for assignments in subproblems]
+        for sub_solutions, sub_returns, sub_evals in pool.imap_unordered(_star_solve_subproblem, tasks):
+            solutions.extend(sub_solutions)
+            returns += sub_returns
+            evals += sub_evals
+
+    return solutions, returns, evals
+
+
+def _star_solve_subproblem(task):
+    """
+    Unpack task arguments for Pool.imap_unordered
+
+    :param task:    Tuple of _solve_subproblem arguments
+
+    :return:    Result of _solve_subproblem
+    """
+    return _solve_subproblem(*task)
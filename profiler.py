@@ -0,0 +1,166 @@
+import json
+from time import perf_counter
+
+from trail import count_removed
+
+# Constraint methods measured by profiler
+PROFILED_METHODS = ('check', 'purge', 'propagate')
+
+
+class Profiler:
+    """
+    Optional instrumentation of SCP search
+
+    Methods of constraints and value loading of the engine are wrapped only when profiler is attached, so engine
+    without profiler runs unchanged code.
+
+    Attributes:
+        constraints     List of profiled constraints in order of attaching
+        stats           Dictionary of constraint: dictionary of calls, time, failures and removed values
+        nodes           List of numbers of values loaded at every stack level
+        active          If wrapped constraint method is running, nested calls are not measured again
+        engines         List of engines with wrapped value loading
+    """
+
+    def __init__(self):
+        """
+        Create profiler without attached engine
+        """
+        self.constraints = []
+        self.stats = dict()
+        self.nodes = []
+        self.active = False
+        self.engines = []
+
+    def attach(self, scp):
+        """
+        Wrap constraint methods and value loading of engine, already wrapped ones are skipped
+
+        :param scp:     SCP engine with loaded problem
+        """
+        for constraints in scp.constraints:
+            for constraint in constraints:
+                if constraint not in self.stats:
+                    self._wrap_constraint(constraint, scp.trail)
+
+        if scp not in self.engines:
+            self.engines.append(scp)
+            load_value = scp._load_value
+
+            def wrapper():
+                depth = scp.pointer
+                while len(self.nodes) <= depth:
+                    self.nodes.append(0)
+                self.nodes[depth] += 1
+                load_value()
+
+            scp._load_value = wrapper
+
+    def clear(self):
+        """
+        Zero all recorded statistics, methods stay wrapped
+        """
+        for stats in self.stats.values():
+            for key in stats:
+                stats[key] = 0
+        self.nodes = []
+
+    def _wrap_constraint(self, constraint, trail):
+        """
+        Replace profiled methods of constraint with measuring wrappers
+
+        :param constraint:  Constraint to wrap
+        :param trail:       Solver trail, changes recorded on it are counted as removed values
+        """
+        stats = {'calls': 0, 'time': 0.0, 'failures': 0, 'removed': 0}
+        self.constraints.append(constraint)
+        self.stats[constraint] = stats
+
+        for name in PROFILED_METHODS:
+            method = getattr(constraint, name, None)
+            if method is not None:
+                setattr(constraint, name, self._measured(method, stats, trail))
+
+    def _measured(self, method, stats, trail):
+        """
+        Create wrapper measuring calls of method
+
+        :param method:  Bound constraint method
+        :param stats:   Statistics of the constraint
+        :param trail:   Solver trail
+
+        :return:    Wrapper with the same signature
+        """
+        def wrapper(*args):
+            if self.active:
+                return method(*args)
+
+            self.active = True
+            position = len(trail)
+            start = perf_counter()
+            try:
+                result = method(*args)
+            finally:
+                stats['time'] += perf_counter() - start
+                self.active = False
+
+            stats['calls'] += 1
+            if not result:
+                stats['failures'] += 1
+            if len(trail) > position:
+                stats['removed'] += count_removed(trail, position)
+
+            return result
+
+        return wrapper
+
+    def to_dict(self):
+        """
+        Collect recorded statistics
+
+        :return:    Dictionary of statistics per constraint class, per constraint, loaded values per stack level and
+                    maximal depth reached
+        """
+        classes = dict()
+        constraints = []
+        for i, constraint in enumerate(self.constraints):
+            stats = self.stats[constraint]
+            class_name = type(constraint).__name__
+            class_stats = classes.setdefault(class_name, {'instances': 0, 'calls': 0, 'time': 0.0, 'failures': 0,
+                                                          'removed': 0})
+            class_stats['instances'] += 1
+            for key, value in stats.items():
+                class_stats[key] += value
+
+            constraints.append({
+                'id': i,
+                'class': class_name,
+                'scope': [list(var.id_) for var in constraint.vars_],
+                **stats
+            })
+
+        return {
+            'classes': classes,
+            'constraints': constraints,
+            'nodes': self.nodes,
+            'max_depth': len(self.nodes)
+        }
+
+    def export(self, file_path):
+        """
+        Save recorded statistics as JSON
+
+        :param file_path:   Path to output file
+        """
+        with open(file_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def show(self):
+        """
+        Show statistics of constraint classes and search depth
+        """
+        data = self.to_dict()
+        for class_name, stats in sorted(data['classes'].items(), key=lambda item: -item[1]['time']):
+            print(f'{class_name:<35} instances {stats["instances"]:>5}  calls {stats["calls"]:>10}  '
+                  f'time {stats["time"]:9.4f}s  failures {stats["failures"]:>8}  removed {stats["removed"]:>10}')
+        print(f'Nodes {sum(data["nodes"])} | Max depth {data["max_depth"]}')
@@ -1,7 +1,31 @@
+import hashlib
+import mmap
+import os
+import struct
+from collections import OrderedDict, deque
+from random import Random
 from time import time
 
 from futoshiki import FutoshikiRowConstraint, FutoshikiRelationConstraint
-from skyscrapper import SkyscrapperRowConstraint, SkyscrapperVisibilityConstraint
+from profiler import Profiler
+from search_trace import TraceWriter, ASSIGN, BACKTRACK, SOLUTION, RESTART
+from skyscrapper import SkyscrapperRowConstraint, SkyscrapperVisibilityConstraint, SkyscrapperPermutationConstraint, \
+    PERMUTATION_TABLE_LIMIT
+from trail import count_removed
+
+# Maximal number of assignments in recorded nogood, longer ones are rarely met again and slow down lookups
+NOGOOD_SIZE_LIMIT = 10
+
+# Binary format of cached models, every cache file starts with header
+MODEL_MAGIC = b'SCPM'
+MODEL_VERSION = 1
+MODEL_TYPES = ['futo', 'sky']
+MODEL_HEADER = struct.Struct('<4sBBHIIII')  # magic, version, type, size, variables, constraints, initial, stack
+MODEL_VARIABLE = struct.Struct('<HHBQ')  # row, column, fixed value or 0, domain after initial purge
+MODEL_CONSTRAINT = struct.Struct('<BhhH')  # kind, 2 parameters, scope length, followed by scope indices
+MODEL_INITIAL = struct.Struct('<Ii')  # constraint, variable index or -1
+MODEL_KINDS = [FutoshikiRowConstraint, FutoshikiRelationConstraint, SkyscrapperRowConstraint,
+               SkyscrapperVisibilityConstraint, SkyscrapperPermutationConstraint]
 
 
 class SCP:
@@ -12,65 +36,164 @@ class SCP:
         method              Method of problem solving:
                                             back    - backtracking
                                             forward - forward checking
+                                            mac     - maintaining arc consistency
         order               Method of ordering call stack:
                                             none    - stack is left in default order
                                             max_dom - max to min domain size
                                             min_dom - min to max domain size
                                             max_con - max to min constraint num
                                             min_con - min to max constraint num
+                                            dom_wdeg - min to max domain size divided by constraints failure weight
         dynamic_ordering    If call stack is being ordered during the search
+        value_order         Order of values tried for every variable:
+                                            desc    - largest to smallest value
+                                            asc     - smallest to largest value
+                                            random  - random order, reproducible with seed
+                                            lcv     - least constraining value, removing fewest neighbour values
+        seed                Seed of random value order
+        random              Random generator of value order and restart tie-breaking
+        restarts            Schedule of restarts, limiting returns of every run until the first solution:
+                                            none        - search is never restarted
+                                            luby        - limits follow Luby sequence multiplied by restart_base
+                                            geometric   - limits start at restart_base and grow by restart_factor
+        restart_base        Number of returns allowed in the first run
+        restart_factor      Growth of the limit between runs in geometric schedule
+        restart_limit       Number of returns at which current run is restarted, None if not limited
+        restarts_num        Number of restarts done
+        nogoods             Store of assignments proven to have no solution, None if not recorded
+        profiler            Profiler of constraints and search depth, None if not profiled
+        trace               Path to binary trace file of the search, None if not traced
+        tracer              Writer of trace during the search
+        trace_record        Bound record method of tracer, None when not tracing
+        backjumping         If search jumps back to the most recent variable causing the conflict
+        alldiff             Strength of filtering in row uniqueness constraints:
+                                            value    - remove values of assigned variables
+                                            matching - remove values not belonging to any maximum matching
+        order_heap          Heap of unassigned variables used to pick the next one when ordering dynamically
+        stack_positions     List of call stack index of every variable, None for variables out of stack
+        conflict_sets       List of sets of stack levels responsible for failures at every stack level, kept with
+                            backjumping or nogood recording
+        solved_levels       Number of first stack levels still assigned as in the last found solution, nogoods are
+                            not recorded under them
         all_solutions       If all solutions should be found
+        count_only          If solutions should be only counted without saving them
         call_stack          List of variables in filling order
+        initial_stack       List of variables in call stack as loaded, before ordering
         initial_constraints List of pairs (constraint, variable) which should be purged at the beginning
-        constraints         Dictionary of variable: list of constraints its included into
+        variables           List of all variables, position in list is the variable index
+        constraints         List of constraints every variable is included into, by variable index
+        weights             List of summed failure weight of constraints of every variable, by variable index
+        counters            List of row constraints counting assigned values of every variable, by variable index
         pointer             Index of variable currently changed, solving terminates when out of stack range
+        trail               List of pairs (variable, old domain) recorded before every domain change
+        trail_marks         List of trail lengths marking the choice point of every stack level
         state               Current problem state
         solutions           List of found solutions
+        solutions_num       Number of found solutions
     """
 
-    def __init__(self, method='back', order='none', dynamic_ordering=False, all_solutions=False):
+    def __init__(self, method='back', order='none', dynamic_ordering=False, all_solutions=False, backjumping=False,
+                 alldiff='value', count_only=False, value_order='desc', seed=None, restarts='none', restart_base=100,
+                 restart_factor=1.5, nogood_limit=0, profile=False, trace=None):
         """
         Create empty SCP engine
 
         :param method:              Method of problem solving:
                                                     back    - backtracking
                                                     forward - forward checking
+                                                    mac     - maintaining arc consistency
         :param order:               Method of ordering call stack
                                                     none    - stack is left in default order
                                                     max_dom - max to min domain size
                                                     min_dom - min to max domain size
                                                     max_con - max to min constraint num
                                                     min_con - min to max constraint num
+                                                    dom_wdeg - min to max domain size divided by constraints failure weight
         :param dynamic_ordering:    If stack should be ordered after each assigment
         :param all_solutions:       If all possible solutions should be found
+        :param backjumping:         If conflict-directed backjumping should be used instead of chronological
+                                    backtracking, with mac every previous variable is treated as conflicting
+        :param alldiff:             Strength of filtering in row uniqueness constraints:
+                                                    value    - remove values of assigned variables
+                                                    matching - remove values not belonging to any maximum matching
+        :param count_only:          If solutions should be only counted, without building them
+        :param value_order:         Order of values tried for every variable:
+                                                    desc    - largest to smallest value
+                                                    asc     - smallest to largest value
+                                                    random  - random order, reproducible with seed
+                                                    lcv     - least constraining value, removing fewest neighbour values
+        :param seed:                Seed of random value order
+        :param restarts:            Schedule of restarts, limiting returns of every run until the first solution:
+                                                    none        - search is never restarted
+                                                    luby        - limits follow Luby sequence times restart_base
+                                                    geometric   - limits grow by restart_factor from restart_base
+        :param restart_base:        Number of returns allowed in the first run
+        :param restart_factor:      Growth of the limit between runs in geometric schedule
+        :param nogood_limit:        Maximal number of stored nogoods, least recently used are evicted, 0 disables
+                                    nogood recording
+        :param profile:             If constraints and search depth should be profiled
+        :param trace:               Path to binary trace file written by every search, None disables tracing
         """
         self.method = method
         self.order = order
         self.dynamic_ordering = dynamic_ordering
         self.all_solutions = all_solutions
+        self.backjumping = backjumping
+        self.alldiff = alldiff
+        self.count_only = count_only
+        self.value_order = value_order
+        self.seed = seed
+        self.random = Random(seed)
+        self.restarts = restarts
+        self.restart_base = restart_base
+        self.restart_factor = restart_factor
+        self.restart_limit = None
+        self.restarts_num = 0
+        self.nogoods = _NogoodStore(nogood_limit) if nogood_limit > 0 else None
+        self.profiler = Profiler() if profile else None
+        self.trace = trace
+        self.tracer = None
+        self.trace_record = None
 
         self.call_stack = []
+        self.initial_stack = []
         self.initial_constraints = []
-        self.constraints = dict()
+        self.variables = []
+        self.constraints = []
+        self.weights = []
+        self.counters = []
         self.pointer = -1
 
+        self.trail = []
+        self.trail_marks = []
+        self.order_heap = None
+        self.stack_positions = []
+        self.conflict_sets = []
+        self.solved_levels = 0
+
         self.state = None
         self.solutions = []
+        self.solutions_num = 0
 
         self.start_time = None
         self.end_time = None
         self.returns = 0
         self.validations = 0
 
-    def load_data(self, file_path, type_=None):
+    def load_data(self, file_path, type_=None, cache_dir=None):
         """
         Load data from file
 
+        With cache directory the model is preprocessed by initial purge of the chosen method and saved in binary
+        form, next loading of the same file content with the same method and filtering strength maps it instead of
+        parsing.
+
         :param file_path:   Path to data file
         :param type_:       Type of problem:
                                         None    - Base on file name
                                         futo    - Futoshiki
                                         sky     - Skyscrapper
+        :param cache_dir:   Directory of cached models, None disables caching
 
         :return:    If data was loaded successfully
         """
@@ -87,18 +210,259 @@ class SCP:
                     type_ = t
                     break
 
-        if type_ == 'futo':
-            return self._load_futoshiki_file(file_path)
-        elif type_ == 'sky':
-            return self._load_skyscrapper_file(file_path)
-        else:
+        if type_ not in MODEL_TYPES:
             print('Wrong file type')
             return False
 
+        if cache_dir is not None:
+            return self._load_cached(file_path, type_, cache_dir)
+        elif type_ == 'futo':
+            loaded = self._load_futoshiki_file(file_path)
+        else:
+            loaded = self._load_skyscrapper_file(file_path)
+
+        self.initial_stack = list(self.call_stack)
+
+        return loaded
+
+    def _load_cached(self, file_path, type_, cache_dir):
+        """
+        Load model from cache, or from data file and save it to cache
+
+        Cache file is named by hash of file content, type of problem, method, filtering strength and format version
+
+        :param file_path:   Path to data file
+        :param type_:       Type of problem
+        :param cache_dir:   Directory of cached models
+
+        :return:    If data was loaded successfully
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                content = f.read()
+        except IOError:
+            return False
+
+        options = repr((type_, self.method, self.alldiff, PERMUTATION_TABLE_LIMIT, MODEL_VERSION)).encode()
+        cache_path = os.path.join(cache_dir, hashlib.sha256(content + options).hexdigest() + '.scpm')
+        if os.path.exists(cache_path) and self._read_model(cache_path, type_):
+            return True
+
+        if not self.load_data(file_path, type_):
+            return False
+        self._preprocess()
+
+        # Domains are stored in 64 bit masks
+        if len(self.state) < 64:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._write_model(cache_path, type_)
+
+        return True
+
+    def _preprocess(self):
+        """
+        Apply initial purge of the method to loaded model, pruned domains become initial ones
+
+        If purge fails the model is left as loaded, so the search finds the failure again
+        """
+        self.weights = [sum(c.weight for c in constraints) for constraints in self.constraints]
+        if self._initial_purge():
+            for var in self.variables:
+                var.initial_domain = var.domain
+        self.reset()
+
+    def _write_model(self, cache_path, type_):
+        """
+        Save loaded model in binary form
+
+        :param cache_path:  Path to cache file
+        :param type_:       Type of problem
+        """
+        constraints = list({c: None for var_constraints in self.constraints for c in var_constraints})
+        constraint_ids = {c: i for i, c in enumerate(constraints)}
+
+        data = bytearray(MODEL_HEADER.pack(MODEL_MAGIC, MODEL_VERSION, MODEL_TYPES.index(type_), len(self.state),
+                                           len(self.variables), len(constraints), len(self.initial_constraints),
+                                           len(self.initial_stack)))
+        for var in self.variables:
+            row, col = var.id_
+            data += MODEL_VARIABLE.pack(row, col, var.value if var.fixed else 0, var.initial_domain)
+
+        for constraint in constraints:
+            if isinstance(constraint, SkyscrapperVisibilityConstraint):
+                params = (constraint.in_sight, 0)
+            elif isinstance(constraint, SkyscrapperPermutationConstraint):
+                params = (constraint.left, constraint.right)
+            else:
+                params = (0, 0)
+            data += MODEL_CONSTRAINT.pack(MODEL_KINDS.index(type(constraint)) + 1, *params, len(constraint.vars_))
+            data += struct.pack(f'<{len(constraint.vars_)}I', *(var.index for var in constraint.vars_))
+
+        # Constraints and counters of every variable keep their order
+        for lists in (self.constraints, self.counters):
+            for var_constraints in lists:
+                data += struct.pack(f'<H{len(var_constraints)}I', len(var_constraints),
+                                    *(constraint_ids[c] for c in var_constraints))
+
+        for constraint, var in self.initial_constraints:
+            data += MODEL_INITIAL.pack(constraint_ids[constraint], -1 if var is None else var.index)
+        data += struct.pack(f'<{len(self.initial_stack)}I', *(var.index for var in self.initial_stack))
+
+        # Written under temporary name, so other processes never map incomplete file
+        temp_path = f'{cache_path}.{os.getpid()}'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, cache_path)
+
+    def _read_model(self, cache_path, type_):
+        """
+        Load model saved by _write_model, file is memory mapped
+
+        :param cache_path:  Path to cache file
+        :param type_:       Type of problem
+
+        :return:    If cache file was valid
+        """
+        try:
+            with open(cache_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic, version, model_type, n, vars_num, constraints_num, initial_num, stack_len = \
+                    MODEL_HEADER.unpack_from(data)
+                if magic != MODEL_MAGIC or version != MODEL_VERSION or model_type != MODEL_TYPES.index(type_):
+                    return False
+                offset = MODEL_HEADER.size
+
+                variables = list(MODEL_VARIABLE.iter_unpack(data[offset:offset + vars_num * MODEL_VARIABLE.size]))
+                offset += vars_num * MODEL_VARIABLE.size
+
+                constraints = []
+                for _ in range(constraints_num):
+                    kind, param1, param2, scope_len = MODEL_CONSTRAINT.unpack_from(data, offset)
+                    offset += MODEL_CONSTRAINT.size
+                    constraints.append((kind, param1, param2, struct.unpack_from(f'<{scope_len}I', data, offset)))
+                    offset += 4 * scope_len
+
+                lists = []
+                for _ in range(2 * vars_num):
+                    length, = struct.unpack_from('<H', data, offset)
+                    lists.append(struct.unpack_from(f'<{length}I', data, offset + 2))
+                    offset += 2 + 4 * length
+
+                initial = list(MODEL_INITIAL.iter_unpack(data[offset:offset + initial_num * MODEL_INITIAL.size]))
+                offset += initial_num * MODEL_INITIAL.size
+                stack = struct.unpack_from(f'<{stack_len}I', data, offset)
+        except (OSError, ValueError, struct.error):
+            return False
+
+        # Variables are created with domains from the file, so constraints see them as after parsing
+        default_domain = [v + 1 for v in range(n)]
+        self.state = [[None] * n for _ in range(n)]
+        for row, col, fixed_value, _ in variables:
+            var = _Variable(len(self.variables), (row, col), [fixed_value] if fixed_value else default_domain,
+                            self.trail)
+            self.variables.append(var)
+            self.state[row][col] = var
+
+        built = []
+        for kind, param1, param2, scope in constraints:
+            constraint_class = MODEL_KINDS[kind - 1]
+            scope = [self.variables[i] for i in scope]
+            if constraint_class is FutoshikiRelationConstraint:
+                built.append(constraint_class(*scope))
+            elif constraint_class is SkyscrapperVisibilityConstraint:
+                built.append(constraint_class(scope, param1))
+            elif constraint_class is SkyscrapperPermutationConstraint:
+                built.append(constraint_class(scope, param1, param2))
+            else:
+                built.append(constraint_class(scope, self.alldiff))
+
+        self.constraints = [[built[i] for i in ids] for ids in lists[:vars_num]]
+        self.counters = [[built[i] for i in ids] for ids in lists[vars_num:]]
+        self.initial_constraints = [(built[c], None if v < 0 else self.variables[v]) for c, v in initial]
+        self.call_stack = [self.variables[i] for i in stack]
+        self.initial_stack = list(self.call_stack)
+
+        for var, (_, _, _, domain) in zip(self.variables, variables):
+            var.domain = var.initial_domain = domain
+
+        return True
+
+    def reset(self, method=None, order=None, dynamic_ordering=None, all_solutions=None, backjumping=None,
+              count_only=None, value_order=None, seed=None, restarts=None):
+        """
+        Restore loaded problem to state from before the search, so it can be solved again without loading
+
+        Parameters left as None keep their current value, strength of row uniqueness filtering is fixed at loading.
+        Restrictions made by restrict are removed.
+
+        :param method:              Method of problem solving
+        :param order:               Method of ordering call stack
+        :param dynamic_ordering:    If stack should be ordered after each assigment
+        :param all_solutions:       If all possible solutions should be found
+        :param backjumping:         If conflict-directed backjumping should be used
+        :param count_only:          If solutions should be only counted, without building them
+        :param value_order:         Order of values tried for every variable
+        :param seed:                Seed of random value order, random generator is reseeded even if not given
+        :param restarts:            Schedule of restarts
+        """
+        if method is not None:
+            self.method = method
+        if order is not None:
+            self.order = order
+        if dynamic_ordering is not None:
+            self.dynamic_ordering = dynamic_ordering
+        if all_solutions is not None:
+            self.all_solutions = all_solutions
+        if backjumping is not None:
+            self.backjumping = backjumping
+        if count_only is not None:
+            self.count_only = count_only
+        if value_order is not None:
+            self.value_order = value_order
+        if seed is not None:
+            self.seed = seed
+        self.random.seed(self.seed)
+        if restarts is not None:
+            self.restarts = restarts
+        if self.nogoods is not None:
+            self.nogoods = _NogoodStore(self.nogoods.limit)
+        if self.profiler is not None:
+            self.profiler.clear()
+
+        # Variables first, row constraints count their values
+        for var in self.variables:
+            var.reset()
+        for constraint in {c: None for constraints in self.constraints for c in constraints}:
+            constraint.reset()
+
+        self.call_stack = list(self.initial_stack)
+        self.weights = []
+        self.pointer = -1
+
+        # Variables keep reference to the trail, so it is emptied in place
+        self.trail.clear()
+        self.trail_marks = []
+        self.order_heap = None
+        self.stack_positions = []
+        self.conflict_sets = []
+        self.solved_levels = 0
+
+        self.solutions = []
+        self.solutions_num = 0
+
+        self.start_time = None
+        self.end_time = None
+        self.returns = 0
+        self.validations = 0
+        self.restart_limit = None
+        self.restarts_num = 0
+
     def _load_skyscrapper_file(self, file_path):
         """
         Load skyscrapper data from file
 
+        Rows not larger than PERMUTATION_TABLE_LIMIT with any clue are constrained by table of permutations,
+        other rows by separate uniqueness and visibility constraints
+
         :param file_path:   Path to data file
 
         :return:    If data was loaded successfully
@@ -117,38 +481,44 @@ class SCP:
             for i in range(n):
                 for j in range(n):
                     pos = (i, j)
-                    var = _Variable(pos, default_domain.copy())
+                    var = _Variable(len(self.variables), pos, default_domain, self.trail)
 
-                    self.constraints[var] = []
+                    self.variables.append(var)
+                    self.constraints.append([])
+                    self.counters.append([])
                     self.state[i].append(var)
                     self.call_stack.append(var)
 
             columns = [[row[i] for row in self.state] for i in range(len(self.state))]
 
-            # Load constraints
+            # Load clues
+            clues = {side: [0] * n for side in 'GDLP'}
             for line in f:
                 line = line.rstrip()
+                if line == '':
+                    continue
                 side, *values = line.split(';')
-
-                if side == 'G':
-                    constraint_rows = columns
-                elif side == 'D':
-                    constraint_rows = (list(reversed(c)) for c in columns)
-                elif side == 'L':
-                    constraint_rows = self.state
-                elif side == 'P':
-                    constraint_rows = (list(reversed(r)) for r in self.state)
-
-                for row, val in zip(constraint_rows, map(int, values)):
-                    constraint_row = SkyscrapperRowConstraint(row)
-                    if val != 0:
-                        constraint_vis = SkyscrapperVisibilityConstraint(row, val)
-                        self.initial_constraints.append((constraint_vis, None))
-
+                clues[side] = [int(v) for v in values]
+
+            # Create constraints, columns are seen from top and bottom, rows from left and right
+            lines = zip(columns + self.state, clues['G'] + clues['L'], clues['D'] + clues['P'])
+            for row, start, end in lines:
+                if n <= PERMUTATION_TABLE_LIMIT and (start or end):
+                    row_constraints = [SkyscrapperPermutationConstraint(row, start, end)]
+                    self.initial_constraints.append((row_constraints[0], None))
+                else:
+                    row_constraints = [SkyscrapperRowConstraint(row, self.alldiff)]
                     for var in row:
-                        self.constraints[var].append(constraint_row)
+                        self.counters[var.index].append(row_constraints[0])
+                    for val, vis_row in ((start, row), (end, list(reversed(row)))):
                         if val != 0:
-                            self.constraints[var].append(constraint_vis)
+                            constraint_vis = SkyscrapperVisibilityConstraint(vis_row, val)
+                            self.initial_constraints.append((constraint_vis, None))
+                            row_constraints.append(constraint_vis)
+
+                for constraint in row_constraints:
+                    for var in row:
+                        self.constraints[var.index].append(constraint)
 
         return True
 
@@ -179,12 +549,14 @@ class SCP:
                 # Load variables for row
                 for j, val in enumerate(cells):
                     val = int(val)
-                    domain = default_domain.copy() if val == 0 else [val]
+                    domain = default_domain if val == 0 else [val]
                     pos = (i, j)
 
-                    var = _Variable(pos, domain)
+                    var = _Variable(len(self.variables), pos, domain, self.trail)
                     self.state[i].append(var)
-                    self.constraints[var] = []
+                    self.variables.append(var)
+                    self.constraints.append([])
+                    self.counters.append([])
 
                     # Add only mutable variables to stack
                     if not var.fixed:
@@ -208,8 +580,8 @@ class SCP:
                 var2 = self.state[row2][col2]
 
                 constraint = FutoshikiRelationConstraint(var1, var2)
-                self.constraints[var1].append(constraint)
-                self.constraints[var2].append(constraint)
+                self.constraints[var1.index].append(constraint)
+                self.constraints[var2.index].append(constraint)
 
                 # Add initial constraints for fixed values
                 if var1.fixed:
@@ -222,11 +594,13 @@ class SCP:
                 row_vars = self.state[i]
                 col_vars = [self.state[r][i] for r in range(n)]
 
-                row_constraint = FutoshikiRowConstraint(row_vars)
-                col_constraint = FutoshikiRowConstraint(col_vars)
+                row_constraint = FutoshikiRowConstraint(row_vars, self.alldiff)
+                col_constraint = FutoshikiRowConstraint(col_vars, self.alldiff)
                 for row_var, col_var in zip(row_vars, col_vars):
-                    self.constraints[row_var].append(row_constraint)
-                    self.constraints[col_var].append(col_constraint)
+                    self.constraints[row_var.index].append(row_constraint)
+                    self.constraints[col_var.index].append(col_constraint)
+                    self.counters[row_var.index].append(row_constraint)
+                    self.counters[col_var.index].append(col_constraint)
 
                     # Add initial constraints for fixed values
                     if row_var.fixed:
@@ -236,9 +610,27 @@ class SCP:
 
         return True
 
-    def _order_stack(self):
+    def restrict(self, assignments):
         """
-        Arrange call stack
+        Restrict variables of loaded problem to single values, solving subproblem of the search tree
+
+        :param assignments: Dictionary of variable position: value
+
+        :return:    If every restricted variable still has its value in domain
+        """
+        for var in self.call_stack:
+            if var.id_ in assignments:
+                var.domain &= 1 << assignments[var.id_]
+                if not var.domain:
+                    return False
+
+        return True
+
+    def _order_key(self):
+        """
+        Get key function of chosen ordering method
+
+        :return:    Function giving sorting key of variable
         """
         if self.order == 'max_dom':
             def key_(v):
@@ -248,23 +640,67 @@ class SCP:
                 return v.domain_size
         elif self.order == 'max_con':
             def key_(v):
-                return -len(self.constraints[v])
+                return -len(self.constraints[v.index])
         elif self.order == 'min_con':
             def key_(v):
-                return len(self.constraints[v])
+                return len(self.constraints[v.index])
+        elif self.order == 'dom_wdeg':
+            weights = self.weights
+
+            def key_(v):
+                return v.domain_size / weights[v.index]
         else:
             def key_(v):
                 return 0
 
-        self.call_stack[self.pointer + 1:] = sorted(self.call_stack[self.pointer + 1:], key=key_)
+        return key_
+
+    def _order_stack(self):
+        """
+        Arrange call stack
+        """
+        self.call_stack[self.pointer + 1:] = sorted(self.call_stack[self.pointer + 1:], key=self._order_key())
+
+    def _select_variable(self):
+        """
+        Move best unassigned variable from order heap to the current stack position
+        """
+        var = self.order_heap.pop()
+        replaced = self.call_stack[self.pointer]
+        position = self.stack_positions[var.index]
+
+        self.call_stack[position] = replaced
+        self.stack_positions[replaced.index] = position
+        self.call_stack[self.pointer] = var
+        self.stack_positions[var.index] = self.pointer
+
+    def _update_order(self, position):
+        """
+        Update order heap with variables changed since given trail position
+
+        :param position:    Trail length before the change
+        """
+        order_heap = self.order_heap
+        if order_heap is not None:
+            for var, _ in self.trail[position:]:
+                if var in order_heap:
+                    order_heap.update(var)
 
     def _step_forward(self):
         """
         Move pointer one step forward and prepare variable
+
+        Domain of the variable is recorded before the choice point mark, so it is restored only when stepping back
         """
         self.pointer += 1
         if self.pointer < len(self.call_stack):
-            self._current_variable().push_state()
+            if self.order_heap is not None:
+                self._select_variable()
+            current_var = self._current_variable()
+            self.trail.append((current_var, current_var.domain))
+            self.trail_marks.append(len(self.trail))
+            if self.explains_conflicts:
+                self.conflict_sets[self.pointer].clear()
             self._load_value()
 
     def _step_backward(self):
@@ -272,15 +708,35 @@ class SCP:
         Move pointer one step backward
         """
         current_var = self._current_variable()
-        current_var.pop_state()
+        if self.trace_record is not None:
+            self.trace_record(BACKTRACK, self.pointer, current_var)
+        self._undo(self.trail_marks.pop() - 1)
+        for constraint in self.counters[current_var.index]:
+            constraint.unassign(current_var.value)
         current_var.value = None
+        if self.order_heap is not None:
+            self.order_heap.push(current_var)
         self.pointer -= 1
 
         self.returns += 1
 
-        if self.method == 'forward' and self.pointer > -1:
+        if self.pointer > -1:
             self._reverse_purge()
 
+    def _undo(self, position):
+        """
+        Restore domains recorded on trail above given position
+
+        :param position:    Trail length to unwind to
+        """
+        trail = self.trail
+        order_heap = self.order_heap
+        while len(trail) > position:
+            var, domain = trail.pop()
+            var.domain = domain
+            if order_heap is not None and var in order_heap:
+                order_heap.update(var)
+
     def _current_variable(self):
         """
         Get current variable
@@ -296,9 +752,12 @@ class SCP:
         :return:    If state is valid
         """
         current_var = self._current_variable()
-        for constraint in self.constraints[current_var]:
+        for constraint in self.constraints[current_var.index]:
             self.validations += 1
             if not constraint.check():
+                self._bump_weight(constraint)
+                if self.explains_conflicts:
+                    self._record_conflict(constraint)
                 return False
 
         return True
@@ -307,10 +766,69 @@ class SCP:
         """
         Load next value to current variable
 
-        When forward checking, before purging with new value last state must be restored
+        Row constraints counting values of the variable are updated with the change
         """
         current_var = self._current_variable()
-        current_var.next_value()
+        counters = self.counters[current_var.index]
+        if current_var.value is not None:
+            for constraint in counters:
+                constraint.unassign(current_var.value)
+        if self.value_order == 'desc':
+            current_var.next_value()
+        else:
+            current_var.next_value(self._choose_value(current_var))
+        for constraint in counters:
+            constraint.assign(current_var.value)
+        if self.trace_record is not None:
+            self.trace_record(ASSIGN, self.pointer, current_var)
+
+    def _choose_value(self, var):
+        """
+        Choose value of variable which should be tried next
+
+        :param var:     Variable to choose value for
+
+        :return:    Chosen value from variable domain
+        """
+        if self.value_order == 'asc':
+            return (var.domain & -var.domain).bit_length() - 1
+        elif self.value_order == 'random':
+            return self.random.choice(var.values)
+        elif self.value_order == 'lcv' and var.domain_size > 1:
+            values = var.values[::-1]
+            if self.restarts != 'none':
+                # Equally constraining values are tried in different order after every restart
+                self.random.shuffle(values)
+            return min(values, key=lambda value: self._removed_values(var, value))
+
+        return var.max_value
+
+    def _removed_values(self, var, value):
+        """
+        Count values removed from other variables domains by purging constraints of variable with given value
+
+        Purge is done on the trail and undone right away
+
+        :param var:     Variable to try value for
+        :param value:   Tried value
+
+        :return:    Number of removed values or infinity if any domain is left empty
+        """
+        old_value = var.value
+        var.value = value
+        position = len(self.trail)
+        for constraint in self.constraints[var.index]:
+            self.validations += 1
+            if not constraint.purge(var):
+                removed = float('inf')
+                break
+        else:
+            removed = count_removed(self.trail, position)
+
+        self._undo(position)
+        var.value = old_value
+
+        return removed
 
     def _initial_purge(self):
         """
@@ -325,8 +843,13 @@ class SCP:
         for constraint, var in self.initial_constraints:
             self.validations += 1
             if not constraint.purge(var):
+                self._bump_weight(constraint)
                 return False
 
+        if self.method == 'mac':
+            all_constraints = {c: None for constraints in self.constraints for c in constraints}
+            success = self._propagate(all_constraints)
+
         return success
 
     def _purge(self):
@@ -337,20 +860,220 @@ class SCP:
         """
         success = True
         current_var = self._current_variable()
-        for constraint in self.constraints[current_var]:
+        position = len(self.trail)
+        for constraint in self.constraints[current_var.index]:
             self.validations += 1
             if not constraint.purge(current_var):
+                self._bump_weight(constraint)
+                if self.explains_conflicts:
+                    self._record_conflict(constraint)
                 success = False
 
+        self._update_order(position)
+
         return success
 
-    def _reverse_purge(self):
+    def _record_conflict(self, constraint):
+        """
+        Add stack levels responsible for failure of constraint to conflict set of current level
+
+        Emptied domains are explained by levels which pruned them. Constraints of current variable which do not purge
+        locally may have pruned them basing on the whole row, so every previous level assigning or pruning a variable
+        of these constraints is added as well. Propagation failures can not be traced back, so with mac every
+        previous level is added.
+
+        :param constraint:  Failed constraint
+        """
+        if self.pointer < 0:
+            return
+
+        conflict_set = self.conflict_sets[self.pointer]
+        if self.method == 'mac':
+            conflict_set.update(range(self.pointer))
+            return
+        elif self.method == 'back':
+            self._add_scope_levels(constraint, conflict_set, False)
+            return
+
+        emptied = [var for var in constraint.vars_ if var.value is None and not var.domain]
+        if emptied:
+            conflict_set.update(self._pruning_levels(emptied))
+
+        for var_constraint in self.constraints[self._current_variable().index]:
+            if not var_constraint.local_purge:
+                self._add_scope_levels(var_constraint, conflict_set, True)
+
+    def _add_scope_levels(self, constraint, conflict_set, pruning):
+        """
+        Add previous stack levels assigning variables of constraint to conflict set
+
+        :param constraint:      Constraint to explain
+        :param conflict_set:    Set to add levels to
+        :param pruning:         If levels pruning unassigned variables should be added too
+        """
+        pruned = []
+        for var in constraint.vars_:
+            if var.value is None:
+                pruned.append(var)
+            else:
+                level = self.stack_positions[var.index]
+                if level is not None and level < self.pointer:
+                    conflict_set.add(level)
+        if pruned and pruning:
+            conflict_set.update(self._pruning_levels(pruned))
+
+    def _pruning_levels(self, vars_):
+        """
+        Find previous stack levels which removed values from domains of given variables
+
+        Constraint which does not purge locally prunes basing on domains of its whole scope, which were pruned by any
+        earlier level. So if any constraint of the variables is such, every level up to the deepest pruning one is
+        returned.
+
+        :param vars_:   Variables to look for
+
+        :return:    Set of stack levels
+        """
+        vars_ = set(vars_)
+        levels = set()
+        trail = self.trail
+        marks = self.trail_marks
+        for level in range(min(self.pointer, len(marks))):
+            # Skip entry of the next level variable, which is recorded right before its mark
+            end = marks[level + 1] - 1 if level + 1 < len(marks) else len(trail)
+            for i in range(marks[level], end):
+                if trail[i][0] in vars_:
+                    levels.add(level)
+                    break
+
+        if levels and not all(c.local_purge for var in vars_ for c in self.constraints[var.index]):
+            levels.update(range(max(levels)))
+
+        return levels
+
+    @property
+    def explains_conflicts(self):
+        """
+        Check if failures are explained by conflict sets
+
+        :return:    If backjumping or nogood recording is used
+        """
+        return self.backjumping or self.nogoods is not None
+
+    def _backjump(self):
+        """
+        Step back to the deepest level in conflict set of current variable until variable with values left is reached
+
+        Conflict set of the exhausted variable is merged into the conflict set of the level it jumps to. Without
+        backjumping it steps back only to the previous level, conflict sets are then kept just to record nogoods.
+
+        :return:    If search can be continued
+        """
+        while not self._current_variable().domain_size:
+            conflict_set = self.conflict_sets[self.pointer]
+            if self.method != 'back':
+                conflict_set.update(self._pruning_levels([self._current_variable()]))
+
+            # Assignments of conflict set levels leave no value to the variable, unless a solution was found below
+            if self.nogoods is not None and self.solved_levels < self.pointer:
+                self._record_nogood(conflict_set)
+
+            target = max(conflict_set, default=-1) if self.backjumping else self.pointer - 1
+            while self.pointer > target:
+                self._step_backward()
+            if self.pointer < 0:
+                return False
+
+            conflict_set.discard(target)
+            self.conflict_sets[target].update(conflict_set)
+
+        return True
+
+    def _record_nogood(self, levels):
+        """
+        Store assignments of given stack levels, which were proven to have no solution
+
+        Nogoods longer than NOGOOD_SIZE_LIMIT are not stored
+
+        :param levels:  Stack levels whose assignments together have no solution
+        """
+        if 0 < len(levels) <= NOGOOD_SIZE_LIMIT:
+            self.nogoods.add((self.call_stack[level].index, self.call_stack[level].value) for level in levels)
+
+    def _violates_nogood(self):
         """
-        Reverse last purge
+        Check if value of current variable completes any stored nogood
+
+        Levels of the other variables of the nogood are added to conflict set
+
+        :return:    If current assignment contains stored nogood
         """
         current_var = self._current_variable()
-        for constraint in self.constraints[current_var]:
-            constraint.reverse_purge(current_var)
+        nogood = self.nogoods.find(current_var.index, current_var.value, self.variables)
+        if nogood is None:
+            return False
+
+        conflict_set = self.conflict_sets[self.pointer]
+        for index, _ in nogood:
+            level = self.stack_positions[index]
+            if level < self.pointer:
+                conflict_set.add(level)
+
+        return True
+
+    def _bump_weight(self, constraint):
+        """
+        Increase failure weight of constraint which caused a failure
+
+        :param constraint:  Failed constraint
+        """
+        constraint.weight += 1
+        for var in constraint.vars_:
+            self.weights[var.index] += 1
+            if self.order_heap is not None and var in self.order_heap:
+                self.order_heap.update(var)
+
+    def _propagate(self, constraints):
+        """
+        Propagate domain changes until every constraint is arc consistent (AC-3)
+
+        Constraint is queued again whenever domain of any of its variables changes
+
+        :param constraints: Constraints to start propagation from
+
+        :return:    If propagation was successful
+        """
+        queue = deque(constraints)
+        queued = set(queue)
+        trail = self.trail
+        start = len(trail)
+        while queue:
+            constraint = queue.popleft()
+            queued.remove(constraint)
+
+            self.validations += 1
+            position = len(trail)
+            if not constraint.propagate():
+                self._bump_weight(constraint)
+                if self.explains_conflicts:
+                    self._record_conflict(constraint)
+                return False
+
+            for var, _ in trail[position:]:
+                for var_constraint in self.constraints[var.index]:
+                    if var_constraint not in queued and var_constraint is not constraint:
+                        queue.append(var_constraint)
+                        queued.add(var_constraint)
+
+        self._update_order(start)
+
+        return True
+
+    def _reverse_purge(self):
+        """
+        Reverse last purge by unwinding trail to the last choice point
+        """
+        self._undo(self.trail_marks[-1])
 
     def show_stats(self):
         """
@@ -374,51 +1097,179 @@ class SCP:
         """
         Solve problem and return final state
 
+        Solutions are saved to solutions list, in count only mode they are just counted
+
         :return:    Final state if successful or None if failed
         """
+        for _ in self._search():
+            self.solutions_num += 1
+            if not self.count_only:
+                self._save_state_as_solution()
+            if not self.all_solutions:
+                break
+
+        return None
+
+    def iter_solutions(self, limit=None):
+        """
+        Yield solutions as soon as they are found, search is resumed when the next one is requested
+
+        Solutions are not saved to solutions list
+
+        :param limit:   Maximal number of solutions, None for all of them
+
+        :return:    Generator of solutions as lists of rows of values
+        """
+        if limit is not None and limit < 1:
+            return
+
+        for _ in self._search():
+            self.solutions_num += 1
+            yield [[v.value for v in row] for row in self.state]
+            if self.solutions_num == limit:
+                return
+
+    def _search(self):
+        """
+        Search through the problem space, yielding each time current state is a solution
+
+        When tracing, trace file is written for the whole search and closed when it ends or is abandoned
+
+        :return:    Generator pausing at every solution
+        """
         self.start_time = time()
+        if self.profiler is not None:
+            self.profiler.attach(self)
+        if self.trace is not None:
+            self.tracer = TraceWriter(self.trace, len(self.state))
+            self.trace_record = self.tracer.record
 
+        try:
+            yield from self._explore()
+        finally:
+            if self.tracer is not None:
+                self.tracer.close()
+                self.tracer = None
+                self.trace_record = None
+
+    def _explore(self):
+        """
+        Explore the search tree from the root
+
+        :return:    Generator pausing at every solution
+        """
         # Initial constraints check and ordering
+        self.weights = [sum(c.weight for c in constraints) for constraints in self.constraints]
         self._order_stack()
         forward_integrity = self._initial_purge()
         if not forward_integrity:
             self.end_time = time()
-            return None
+            return
+
+        self._prepare_stack()
+        if self.restarts != 'none':
+            self.restart_limit = self._restart_budget()
 
         self._step_forward()
         while True:
-            # Order
-            if self.dynamic_ordering:
-                self._order_stack()
-
             # Solution found
             if self.pointer == len(self.call_stack):
-                self._save_state_as_solution()
-                if not self.all_solutions:
-                    self.end_time = time()
-                    return None
+                self.end_time = time()
+                if self.tracer is not None:
+                    self.tracer.mark(SOLUTION, self.pointer)
+
+                # Restarting would visit found solutions again
+                self.restart_limit = None
+                self.solved_levels = self.pointer
+                yield
 
                 self.pointer -= 1
                 forward_integrity = False
+                if self.explains_conflicts:
+                    # Other solutions can be anywhere, so every previous level must be revisited
+                    self.conflict_sets[self.pointer].update(range(self.pointer))
 
             # Integrity
-            elif self.method == 'forward':
-                forward_integrity = self._purge()
             else:
-                forward_integrity = self._check()
+                if self.nogoods is not None and self._violates_nogood():
+                    forward_integrity = False
+                elif self.method == 'forward':
+                    forward_integrity = self._purge()
+                elif self.method == 'mac':
+                    forward_integrity = self._propagate(self.constraints[self._current_variable().index])
+                else:
+                    forward_integrity = self._check()
 
             if forward_integrity:
                 self._step_forward()
             else:
-                if self.method == 'forward':
-                    self._reverse_purge()
-                while not self._current_variable().domain_size:
-                    self._step_backward()
-                    if self.pointer < 0:
+                self._reverse_purge()
+                if self.explains_conflicts:
+                    if not self._backjump():
                         self.end_time = time()
-                        return None
+                        return
+                else:
+                    while not self._current_variable().domain_size:
+                        self._step_backward()
+                        if self.pointer < 0:
+                            self.end_time = time()
+                            return
+                if self.restart_limit is not None and self.returns >= self.restart_limit:
+                    self._restart()
+                    continue
+                self.solved_levels = min(self.solved_levels, self.pointer)
                 self._load_value()
 
+    def _prepare_stack(self):
+        """
+        Index ordered call stack and create structures of search over it
+        """
+        self.stack_positions = [None] * len(self.variables)
+        for i, var in enumerate(self.call_stack):
+            self.stack_positions[var.index] = i
+        self.conflict_sets = [set() for _ in self.call_stack]
+        if self.dynamic_ordering:
+            self.order_heap = _VariableHeap(self._order_key(), self.call_stack)
+
+    def _restart_budget(self):
+        """
+        Get number of returns allowed in the next run
+
+        :return:    Number of returns
+        """
+        if self.restarts == 'luby':
+            return self.restart_base * _luby(self.restarts_num + 1)
+
+        return int(self.restart_base * self.restart_factor ** self.restarts_num)
+
+    def _restart(self):
+        """
+        Abandon current run and start a new one from the root
+
+        Call stack is shuffled before ordering, so variables with equal keys are picked in different order. Failure
+        weights of constraints are kept, so dom_wdeg ordering learns from all previous runs.
+        """
+        for var in self.call_stack[:self.pointer + 1]:
+            for constraint in self.counters[var.index]:
+                constraint.unassign(var.value)
+            var.value = None
+
+        # Trail below the first mark holds the initial purge
+        self.order_heap = None
+        self._undo(self.trail_marks[0] - 1)
+        self.trail_marks = []
+        self.pointer = -1
+
+        self.restarts_num += 1
+        self.restart_limit = self.returns + self._restart_budget()
+        if self.tracer is not None:
+            self.tracer.mark(RESTART, self.restarts_num)
+
+        self.random.shuffle(self.call_stack)
+        self._order_stack()
+        self._prepare_stack()
+        self._step_forward()
+
     def _save_state_as_solution(self):
         """
         Save current state as solution
@@ -431,12 +1282,12 @@ class SCP:
         """
         Show all saved solutions
         """
-        if self.solutions:
+        if self.solutions_num:
             for solution in self.solutions:
                 for row in solution:
                     print(row)
                 print('=' * 25)
-            print(f'Found {len(self.solutions)} solutions')
+            print(f'Found {self.solutions_num} solutions')
         else:
             print('No solutions found')
 
@@ -448,102 +1299,362 @@ class SCP:
             print([v.value for v in row])
 
 
+class _NogoodStore:
+    """
+    Bounded store of nogoods, sets of assignments which can not be extended to a solution
+
+    Every nogood is watched by all its assignments, so it is found when any of them is made
+
+    Attributes:
+        limit       Maximal number of stored nogoods, least recently used are evicted
+        nogoods     Ordered dictionary of nogoods from least to most recently used, nogood is frozenset of pairs
+                    (variable index, value)
+        watches     Dictionary of (variable index, value): set of nogoods containing the assignment
+    """
+
+    def __init__(self, limit):
+        """
+        Create empty store
+
+        :param limit:   Maximal number of stored nogoods
+        """
+        self.limit = limit
+        self.nogoods = OrderedDict()
+        self.watches = dict()
+
+    def __len__(self):
+        """
+        Get number of stored nogoods
+
+        :return:    Number of nogoods
+        """
+        return len(self.nogoods)
+
+    def add(self, assignments):
+        """
+        Store nogood, evicting the least recently used one when full
+
+        :param assignments: Iterable of pairs (variable index, value)
+        """
+        nogood = frozenset(assignments)
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+
+        self.nogoods[nogood] = None
+        for assignment in nogood:
+            self.watches.setdefault(assignment, set()).add(nogood)
+
+        if len(self.nogoods) > self.limit:
+            evicted, _ = self.nogoods.popitem(last=False)
+            for assignment in evicted:
+                watching = self.watches[assignment]
+                watching.discard(evicted)
+                if not watching:
+                    del self.watches[assignment]
+
+    def find(self, index, value, variables):
+        """
+        Find nogood containing given assignment whose other assignments are all made
+
+        :param index:       Index of assigned variable
+        :param value:       Assigned value
+        :param variables:   List of all variables by index
+
+        :return:    Found nogood or None
+        """
+        for nogood in self.watches.get((index, value), ()):
+            for var_index, var_value in nogood:
+                if variables[var_index].value != var_value:
+                    break
+            else:
+                self.nogoods.move_to_end(nogood)
+                return nogood
+
+        return None
+
+
+class _VariableHeap:
+    """
+    Indexed binary min heap of variables, updated in place when their keys change
+
+    Variables with equal keys are ordered by their position in the list the heap was created from
+
+    Attributes:
+        key_        Function giving ordering key of variable
+        heap        List of variables in heap order
+        keys        Dictionary of variable: (key, rank) it is ordered by
+        positions   Dictionary of variable: index in heap list
+        ranks       Dictionary of variable: rank breaking ties between equal keys
+    """
+
+    def __init__(self, key_, vars_):
+        """
+        Create heap with given variables
+
+        :param key_:    Function giving ordering key of variable
+        :param vars_:   Variables to put into heap
+        """
+        self.key_ = key_
+        self.heap = []
+        self.keys = dict()
+        self.positions = dict()
+        self.ranks = {var: rank for rank, var in enumerate(vars_)}
+        for var in vars_:
+            self.push(var)
+
+    def __len__(self):
+        """
+        Get number of variables in heap
+
+        :return:    Number of variables
+        """
+        return len(self.heap)
+
+    def __contains__(self, var):
+        """
+        Check if variable is in heap
+
+        :param var:     Variable to look for
+
+        :return:    If variable is in heap
+        """
+        return var in self.positions
+
+    def push(self, var):
+        """
+        Add variable to heap
+
+        :param var:     Variable to add
+        """
+        self.keys[var] = (self.key_(var), self.ranks[var])
+        self.positions[var] = len(self.heap)
+        self.heap.append(var)
+        self._sift_up(len(self.heap) - 1)
+
+    def pop(self):
+        """
+        Remove variable with the lowest key from heap
+
+        :return:    Removed variable
+        """
+        heap = self.heap
+        top = heap[0]
+        last = heap.pop()
+        del self.positions[top]
+        if heap:
+            heap[0] = last
+            self.positions[last] = 0
+            self._sift_down(0)
+
+        return top
+
+    def update(self, var):
+        """
+        Restore heap order after key of variable changed
+
+        :param var:     Changed variable
+        """
+        key = (self.key_(var), self.ranks[var])
+        old_key = self.keys[var]
+        if key != old_key:
+            self.keys[var] = key
+            if key < old_key:
+                self._sift_up(self.positions[var])
+            else:
+                self._sift_down(self.positions[var])
+
+    def _sift_up(self, index):
+        """
+        Move variable up until its parent has lower key
+
+        :param index:   Index of variable in heap list
+        """
+        heap = self.heap
+        keys = self.keys
+        positions = self.positions
+        var = heap[index]
+        key = keys[var]
+        while index > 0:
+            parent_index = (index - 1) >> 1
+            parent = heap[parent_index]
+            if keys[parent] <= key:
+                break
+            heap[index] = parent
+            positions[parent] = index
+            index = parent_index
+        heap[index] = var
+        positions[var] = index
+
+    def _sift_down(self, index):
+        """
+        Move variable down until its children have higher keys
+
+        :param index:   Index of variable in heap list
+        """
+        heap = self.heap
+        keys = self.keys
+        positions = self.positions
+        size = len(heap)
+        var = heap[index]
+        key = keys[var]
+        while True:
+            child_index = 2 * index + 1
+            if child_index >= size:
+                break
+            if child_index + 1 < size and keys[heap[child_index + 1]] < keys[heap[child_index]]:
+                child_index += 1
+            child = heap[child_index]
+            if key <= keys[child]:
+                break
+            heap[index] = child
+            positions[child] = index
+            index = child_index
+        heap[index] = var
+        positions[var] = index
+
+
 class _Variable:
     """
     Single variable in problem
 
+    Domain is stored as a bitmask, bit v is set when value v is in the domain. Variables are compared and hashed by
+    identity, every one of them is created once per problem.
+
     Attributes:
+        index           Index of variable in problem, used to look up its constraints
         id_             Unique variable identifier
-        domain          Domain of the variable
-        state_stack     Stack of domain states
+        domain          Bitmask of the variable domain
+        initial_domain  Bitmask of the variable domain as loaded
+        trail           Solver trail, domain is recorded on it before every change
         value           Current value of the variable
         fixed           If variable value is fixed
     """
 
-    def __init__(self, id_, domain):
+    __slots__ = ('index', 'id_', 'domain', 'initial_domain', 'trail', 'value', 'fixed')
+
+    def __init__(self, index, id_, domain, trail):
         """
         Create variable with given domain
 
+        :param index:   Index of variable in problem
         :param id_:     Variable identifier
-        :param domain:  Variables domain
+        :param domain:  Iterable of values in variables domain
+        :param trail:   Solver trail shared by all variables
         """
+        self.index = index
         self.id_ = id_
-        self.domain = domain
-        self.state_stack = []
-        if len(domain) == 1:
-            self.value = domain[0]
+        self.domain = 0
+        for v in domain:
+            self.domain |= 1 << v
+        self.initial_domain = self.domain
+        self.trail = trail
+        if self.domain_size == 1:
+            self.value = self.max_value
             self.fixed = True
         else:
             self.value = None
             self.fixed = False
 
+    def reset(self):
+        """
+        Restore domain and value from before the search
+        """
+        self.domain = self.initial_domain
+        self.value = self.max_value if self.fixed else None
+
     def __str__(self):
         """
         Create text representation of variable
 
         :return:    Text representation
         """
-        return f'ID: {self.id_} | V: {self.value} | D: {self.domain}'
+        return f'ID: {self.id_} | V: {self.value} | D: {self.values}'
 
-    def __eq__(self, other):
+    @property
+    def domain_size(self):
         """
-        Check if objects are equal
-
-        :param other:   Object to compare to
+        Get size of domain
 
-        :return:    If objects are equal
+        :return:    Size of domain
         """
-        return self.id_ == other.id_
+        return self.domain.bit_count()
 
-    def __ne__(self, other):
+    @property
+    def values(self):
         """
-        Check if objects are different
-
-        :param other:   Object to compare to
+        Get values left in domain
 
-        :return:    If objects are equal
+        :return:    List of values in ascending order
         """
-        return not (self == other)
+        domain = self.domain
+        values = []
+        while domain:
+            low_bit = domain & -domain
+            values.append(low_bit.bit_length() - 1)
+            domain ^= low_bit
+        return values
 
-    def __hash__(self):
+    @property
+    def min_value(self):
         """
-        Get objects hash
+        Get smallest value in domain
 
-        :return:    Objects hash
+        :return:    Smallest value or -1 if domain is empty
         """
-        return hash(self.id_)
+        return (self.domain & -self.domain).bit_length() - 1
 
-    def push_state(self):
-        """
-        Push domain state onto stack
+    @property
+    def max_value(self):
         """
-        self.state_stack.append(self.domain.copy())
+        Get largest value in domain
 
-    def pop_state(self):
-        """
-        Pop domain state from stack
+        :return:    Largest value or -1 if domain is empty
         """
-        self.domain = self.state_stack.pop()
+        return self.domain.bit_length() - 1
 
-    @property
-    def domain_size(self):
+    def next_value(self, value=None):
         """
-        Get size of domain
+        Set variables value to next value from work domain
 
-        :return:    Size of domain
+        :param value:   Value to take from domain, the largest one if None
         """
-        return len(self.domain)
+        self.value = self.domain.bit_length() - 1 if value is None else value
+        self.domain ^= 1 << self.value
 
-    def next_value(self):
+    def remove_value(self, value):
         """
-        Set variables value to next value from work domain
+        Remove single value from work domain
+
+        :param value:   Value to remove
         """
-        self.value = self.domain.pop()
+        domain = self.domain & ~(1 << value)
+        if domain != self.domain:
+            self.trail.append((self, self.domain))
+            self.domain = domain
 
-    def filter_domain(self, predicate):
+    def filter_domain(self, mask):
         """
-        Filter work domain with given predicate
+        Filter work domain with given bitmask, old domain is recorded on trail if it changes
 
-        :param predicate:    Predicate to filter with
+        :param mask:    Bitmask of values allowed to stay
         """
-        self.domain = list(filter(predicate, self.domain))
+        domain = self.domain & mask
+        if domain != self.domain:
+            self.trail.append((self, self.domain))
+            self.domain = domain
+
+
+def _luby(i):
+    """
+    Get element of Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ...
+
+    :param i:   Position in sequence, starting from 1
+
+    :return:    Element of sequence
+    """
+    while True:
+        k = i.bit_length()
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
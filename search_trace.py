@@ -0,0 +1,185 @@
+import argparse
+import struct
+from collections import Counter
+
+# Header of trace file: magic, version, problem size
+MAGIC = b'SCPT'
+VERSION = 2
+HEADER = struct.Struct('<4sBH')
+
+# Record: event, stack depth, variable index, value
+RECORD = struct.Struct('<BHHB')
+_pack_record = RECORD.pack_into
+
+ASSIGN = 1
+BACKTRACK = 2
+FAILURE = 3  # Not written, assignment is failed when followed by next one at the same depth, backtrack or restart
+SOLUTION = 4
+RESTART = 5
+
+EVENT_NAMES = {
+    ASSIGN: 'assign',
+    BACKTRACK: 'backtrack',
+    FAILURE: 'failure',
+    SOLUTION: 'solution',
+    RESTART: 'restart'
+}
+
+
+class TraceWriter:
+    """
+    Buffered writer of binary search trace
+
+    Records are packed in place into preallocated buffer, which is written when full
+
+    Attributes:
+        file            Opened trace file
+        buffer          Preallocated bytes of records waiting for write
+        position        Number of used bytes of buffer
+        end             Size of buffer in bytes
+    """
+
+    def __init__(self, file_path, size, buffer_records=8192):
+        """
+        Open trace file and write header
+
+        :param file_path:       Path to trace file, overwritten if exists
+        :param size:            Size of problem, variables are indexed row by row
+        :param buffer_records:  Number of records buffered before write
+        """
+        self.file = open(file_path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, size))
+        self.buffer = bytearray(buffer_records * RECORD.size)
+        self.position = 0
+        self.end = len(self.buffer)
+
+    def record(self, event, depth, var):
+        """
+        Add record about variable
+
+        :param event:   Type of event
+        :param depth:   Stack level of the event
+        :param var:     Assigned variable the event is about, its index and current value are recorded
+        """
+        position = self.position
+        _pack_record(self.buffer, position, event, depth, var.index, var.value)
+        self.position = position = position + RECORD.size
+        if position == self.end:
+            self.flush()
+
+    def mark(self, event, depth):
+        """
+        Add record not related to any variable
+
+        :param event:   Type of event
+        :param depth:   Stack level of the event
+        """
+        _pack_record(self.buffer, self.position, event, depth, 0, 0)
+        self.position += RECORD.size
+        if self.position == self.end:
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered records to file
+        """
+        self.file.write(memoryview(self.buffer)[:self.position])
+        self.position = 0
+
+    def close(self):
+        """
+        Write buffered records and close file
+        """
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def read_trace(file_path):
+    """
+    Read records of trace file, failures are restored after assignments they end
+
+    :param file_path:   Path to trace file
+
+    :return:    Generator of (event, depth, row, col, value) tuples
+    """
+    with open(file_path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or HEADER.unpack(header)[:2] != (MAGIC, VERSION):
+            raise ValueError(f'{file_path} is not a search trace')
+        size = HEADER.unpack(header)[2]
+
+        # Last record if it was assignment
+        assigned = None
+
+        while True:
+            chunk = f.read(RECORD.size * 65536)
+            if not chunk:
+                return
+            for event, depth, index, value in RECORD.iter_unpack(chunk[:len(chunk) - len(chunk) % RECORD.size]):
+                if assigned is not None and (event == RESTART or event != SOLUTION and depth == assigned[1]):
+                    yield (FAILURE,) + assigned[1:]
+                row, col = divmod(index, size)
+                assigned = (event, depth, row, col, value) if event == ASSIGN else None
+                yield event, depth, row, col, value
+
+
+def summarize(file_path, top=10):
+    """
+    Rebuild search tree statistics from trace
+
+    :param file_path:   Path to trace file
+    :param top:         Number of hotspots to report
+
+    :return:    Dictionary of event counts, assignments at every depth, maximal depth and hotspots, which are
+                variables and values with the most failures and backtracks
+    """
+    events = Counter()
+    nodes = []
+    failures = Counter()
+    backtracks = Counter()
+    for event, depth, row, col, value in read_trace(file_path):
+        events[EVENT_NAMES.get(event, event)] += 1
+        if event == ASSIGN:
+            while len(nodes) <= depth:
+                nodes.append(0)
+            nodes[depth] += 1
+        elif event == FAILURE:
+            failures[(row, col, value)] += 1
+        elif event == BACKTRACK:
+            backtracks[(row, col)] += 1
+
+    return {
+        'events': dict(events),
+        'nodes': nodes,
+        'max_depth': len(nodes),
+        'failures': failures.most_common(top),
+        'backtracks': backtracks.most_common(top)
+    }
+
+
+def main(argv=None):
+    """
+    Show summary of trace from command line
+
+    :param argv:    Command line arguments, sys.argv if None
+    """
+    parser = argparse.ArgumentParser(description='Summarize SCP search trace')
+    parser.add_argument('trace', help='path to trace file')
+    parser.add_argument('--top', type=int, default=10, help='number of hotspots to show')
+    args = parser.parse_args(argv)
+
+    summary = summarize(args.trace, args.top)
+    print('Events: ' + ', '.join(f'{name} {count}' for name, count in summary['events'].items()))
+    print(f'Max depth {summary["max_depth"]}')
+    print('Assignments per depth: ' + ' '.join(str(count) for count in summary['nodes']))
+    print('Failing assignments (row, col, value):')
+    for (row, col, value), count in summary['failures']:
+        print(f'    {chr(65 + row)}{col + 1} = {value}: {count}')
+    print('Backtracked variables:')
+    for (row, col), count in summary['backtracks']:
+        print(f'    {chr(65 + row)}{col + 1}: {count}')
+
+
+if __name__ == '__main__':
+    main()
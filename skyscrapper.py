@@ -1,29 +1,95 @@
-from itertools import islice
+from functools import lru_cache
+from itertools import permutations
 
+from alldiff import AllDifferentConstraint
 
-class SkyscrapperRowConstraint:
+# Largest row size for which all permutations are enumerated
+PERMUTATION_TABLE_LIMIT = 9
+
+
+class SkyscrapperRowConstraint(AllDifferentConstraint):
     """
     Constraint of unique values in skyscrapper row
     """
 
-    def __init__(self, vars_):
+
+class SkyscrapperVisibilityConstraint:
+    """
+    Constraint of visibility in skyscrapper row
+    """
+
+    # Purge removes values depending on domains of the whole row
+    local_purge = False
+
+    def __init__(self, vars_, in_sight):
         """
-        Create row constraint where every value must be unique
+        Create row constraint where <in_sight> buildings must be visible from left
 
-        :param vars_:    Variables in row
+        :param vars_:   Variables in row
+        :param in_sight:    Number of required visible buildings from left
         """
         self.vars_ = vars_
+        self.weight = 1
+        self.in_sight = int(in_sight)
+        self.domain_size = int(self.vars_[0].domain_size)
+
+    def _candidates(self):
+        """
+        Get possible heights of every building in row
+
+        :return:    List of assigned value or values left in domain for every building
+        """
+        return [[var.value] if var.value is not None else var.values for var in self.vars_]
+
+    def _suffix_bounds(self, candidates):
+        """
+        Calculate bounds of buildings visible in every suffix of row, ignoring uniqueness of heights
+
+        :param candidates:  Possible heights of every building
+
+        :return:    List where bounds[i][h] is pair (min, max) of visible buildings from i-th to the last one,
+                    when the tallest building before them has height h, or None if heights can not be chosen
+        """
+        heights = range(self.domain_size + 1)
+        bounds = [None] * len(candidates) + [[(0, 0)] * len(heights)]
+        for i in range(len(candidates) - 1, -1, -1):
+            next_bounds = bounds[i + 1]
+            current = []
+            for height in heights:
+                low = high = None
+                for value in candidates[i]:
+                    if value > height:
+                        next_bound = next_bounds[value]
+                        seen = 1
+                    else:
+                        next_bound = next_bounds[height]
+                        seen = 0
+                    if next_bound is None:
+                        continue
+                    if low is None or next_bound[0] + seen < low:
+                        low = next_bound[0] + seen
+                    if high is None or next_bound[1] + seen > high:
+                        high = next_bound[1] + seen
+                current.append(None if low is None else (low, high))
+            bounds[i] = current
+
+        return bounds
+
+    def reset(self):
+        """
+        Restore state from before the search
+        """
+        self.weight = 1
 
     def check(self):
         """
-        Check if constraint is meet
+        Check if constraint can still be meet
 
-        :return: If constraint is meet
+        :return:    If required number of visible buildings is within bounds achievable with domains left
         """
-        # Filter out Nones
-        set_values = [v.value for v in self.vars_ if v.value is not None]
+        bounds = self._suffix_bounds(self._candidates())[0][0]
 
-        return len(set_values) == len(set(set_values))
+        return bounds is not None and bounds[0] <= self.in_sight <= bounds[1]
 
     def purge(self, var):
         """
@@ -33,70 +99,119 @@ class SkyscrapperRowConstraint:
 
         :return:    If all domains are left with at least one value
         """
-        valid_domains = True
-
-        def predicate(x):
-            return x != var.value
-
-        for row_var in self.vars_:
-            if row_var != var and row_var.value is None:
-                row_var.push_state()
-                row_var.filter_domain(predicate)
-                if row_var.value is None and not row_var.domain_size:
-                    valid_domains = False
+        if var is None:
+            for i, row_var in enumerate(self.vars_):
+                # Keep only values not higher than the tallest building that leaves enough visible
+                row_var.filter_domain((2 << (self.domain_size - self.in_sight + i + 1)) - 1)
+                if row_var.domain_size == 0:
+                    return False
 
-        return valid_domains
+        return self.propagate()
 
-    def reverse_purge(self, var):
+    def propagate(self):
         """
-        Reverse states of variables changed with given variable purge
+        Keep in domains only values for which required number of visible buildings is within achievable bounds
 
-        :param var: Variable which purge will be reversed
+        :return:    If all domains are left with at least one value
         """
-        for row_var in self.vars_:
-            if row_var != var and row_var.value is None:
-                row_var.pop_state()
+        candidates = self._candidates()
+        suffix_bounds = self._suffix_bounds(candidates)
+        bounds = suffix_bounds[0][0]
+        if bounds is None or not bounds[0] <= self.in_sight <= bounds[1]:
+            return False
 
+        # Bounds of visible buildings before i-th one, for every height of the tallest of them
+        prefix_bounds = {0: (0, 0)}
+        for i, var in enumerate(self.vars_):
+            next_bounds = suffix_bounds[i + 1]
+            next_prefix_bounds = dict()
+            supported = 0
+            for height, (low, high) in prefix_bounds.items():
+                for value in candidates[i]:
+                    if value > height:
+                        new_height, seen = value, 1
+                    else:
+                        new_height, seen = height, 0
+                    next_bound = next_bounds[new_height]
+                    if next_bound is None:
+                        continue
+                    if low + seen + next_bound[0] <= self.in_sight <= high + seen + next_bound[1]:
+                        supported |= 1 << value
 
-class SkyscrapperVisibilityConstraint:
+                        # Extend prefix only with values leading to a solution
+                        if new_height in next_prefix_bounds:
+                            old_low, old_high = next_prefix_bounds[new_height]
+                            next_prefix_bounds[new_height] = (min(old_low, low + seen), max(old_high, high + seen))
+                        else:
+                            next_prefix_bounds[new_height] = (low + seen, high + seen)
+
+            if not next_prefix_bounds:
+                return False
+            if var.value is None:
+                var.filter_domain(supported)
+            prefix_bounds = next_prefix_bounds
+
+        return True
+
+
+class SkyscrapperPermutationConstraint:
     """
-    Constraint of visibility in skyscrapper row
+    Constraint of whole skyscrapper row, which must be one of precomputed permutations matching both clues
     """
 
-    def __init__(self, vars_, in_sight):
+    # Purge removes values depending on domains of the whole row
+    local_purge = False
+
+    def __init__(self, vars_, left, right):
         """
-        Create row constraint where <in_sight> buildings must be visible from left
+        Create row constraint where buildings are unique and <left>, <right> of them are visible from both ends
 
         :param vars_:   Variables in row
-        :param in_sight:    Number of required visible buildings from left
+        :param left:    Number of required visible buildings from left, 0 if not restricted
+        :param right:   Number of required visible buildings from right, 0 if not restricted
         """
         self.vars_ = vars_
-        self.in_sight = int(in_sight)
-        self.domain_size = int(self.vars_[0].domain_size)
+        self.weight = 1
+        self.left = int(left)
+        self.right = int(right)
+        self.permutations_num, self.supports = permutation_table(len(vars_), self.left, self.right)
 
-        self.domain_size = int(self.vars_[0].domain_size)
-        self.min_field = vars_[0].domain_size
+    def _surviving(self):
+        """
+        Find permutations matching assigned values and domains of the row
 
-    def check(self):
+        :return:    Bitmask of surviving permutations
         """
-        Check if constraint is meet
+        surviving = (1 << self.permutations_num) - 1
+        for var, supports in zip(self.vars_, self.supports):
+            if var.value is not None:
+                surviving &= supports[var.value]
+            else:
+                allowed = 0
+                domain = var.domain
+                while domain:
+                    low_bit = domain & -domain
+                    allowed |= supports[low_bit.bit_length() - 1]
+                    domain ^= low_bit
+                surviving &= allowed
+            if not surviving:
+                break
 
-        :return:    If constraint is meet
+        return surviving
+
+    def reset(self):
+        """
+        Restore state from before the search
         """
-        heights = (v.value for v in self.vars_)
+        self.weight = 1
 
-        max_height = 0
-        visible = 0
-        for height in heights:
-            if height is None:
-                return True
-            if height > max_height:
-                visible += 1
-                max_height = height
-                if visible > self.in_sight:
-                    return False
+    def check(self):
+        """
+        Check if constraint can still be meet
 
-        return visible == self.in_sight
+        :return:    If any permutation matches the row
+        """
+        return self._surviving() != 0
 
     def purge(self, var):
         """
@@ -106,62 +221,87 @@ class SkyscrapperVisibilityConstraint:
 
         :return:    If all domains are left with at least one value
         """
-        valid_domains = True
+        return self.propagate()
 
-        if var is None:
-            for i, row_var in enumerate(self.vars_):
-                row_var.filter_domain(lambda x: x <= (self.domain_size - self.in_sight + i + 1))
-                if row_var.domain_size == 0:
-                    return False
-        else:
-            # Find index of the new var
-            new_var_pos = self.vars_.index(var)
-            if new_var_pos < self.min_field:
-                # Check if the value will be covered
-                max_height = 0
-                for prev_var in islice(self.vars_, new_var_pos):
-                    if prev_var.value is not None:
-                        prev_val = prev_var.value
-                    elif prev_var.domain_size > 0:
-                        prev_val = min(prev_var.domain)
-                    else:
-                        prev_val = 0
-                    if prev_val > max_height:
-                        max_height = prev_val
-                if max_height > var.value:
-                    # Shift min highest value index if the value will be covered
-                    if self.min_field < len(self.vars_):
-                        domain_size = len(self.vars_)
-                        self.vars_[self.min_field].push_state()
-                        self.vars_[self.min_field].filter_domain(lambda x: x != domain_size)
-                        if self.vars_[self.min_field].domain_size == 0:
-                            valid_domains = False
-                    self.min_field += 1
-
-        return valid_domains
-
-    def reverse_purge(self, var):
-        """
-        Reverse states of variables changed with given variable purge
-
-        :param var: Variable which purge will be reversed
-        """
-        # Find index of the var
-        new_var_pos = self.vars_.index(var)
-        if new_var_pos < self.min_field:
-            # Check if the value will be covered
-            max_height = 0
-            for prev_var in islice(self.vars_, new_var_pos):
-                if prev_var.value is not None:
-                    prev_val = prev_var.value
-                elif prev_var.domain_size > 0:
-                    prev_val = min(prev_var.domain)
-                else:
-                    prev_val = 0
-                if prev_val > max_height:
-                    max_height = prev_val
-            if max_height > var.value:
-                # Reverse shift and state if the value will be covered
-                self.min_field -= 1
-                if self.min_field < len(self.vars_):
-                    self.vars_[self.min_field].pop_state()
+    def propagate(self):
+        """
+        Keep in domains only values which appear in any surviving permutation at their position
+
+        :return:    If all domains are left with at least one value
+        """
+        surviving = self._surviving()
+        if not surviving:
+            return False
+
+        for var, supports in zip(self.vars_, self.supports):
+            if var.value is None:
+                mask = 0
+                for value, support in enumerate(supports):
+                    if support & surviving:
+                        mask |= 1 << value
+                var.filter_domain(mask)
+
+        return True
+
+
+def _visible(heights):
+    """
+    Count buildings visible from the start of sequence
+
+    :param heights: Heights of buildings
+
+    :return:    Number of visible buildings
+    """
+    max_height = 0
+    visible = 0
+    for height in heights:
+        if height > max_height:
+            visible += 1
+            max_height = height
+
+    return visible
+
+
+@lru_cache(maxsize=None)
+def _row_permutations(size):
+    """
+    Group all rows of given size by the number of buildings visible from both ends
+
+    :param size:    Number of buildings in row
+
+    :return:    Dictionary of (left, right): list of rows
+    """
+    groups = dict()
+    for row in permutations(range(1, size + 1)):
+        key = (_visible(row), _visible(reversed(row)))
+        groups.setdefault(key, []).append(row)
+
+    return groups
+
+
+@lru_cache(maxsize=None)
+def permutation_table(size, left, right):
+    """
+    Get table of rows matching clues, shared by all constraints with the same clues
+
+    :param size:    Number of buildings in row
+    :param left:    Number of buildings visible from left, 0 if not restricted
+    :param right:   Number of buildings visible from right, 0 if not restricted
+
+    :return:    Number of matching rows and list of supports, where supports[i][v] is bitmask of rows with
+                value v at position i
+    """
+    rows = [row for (row_left, row_right), group in sorted(_row_permutations(size).items())
+            if left in (0, row_left) and right in (0, row_right)
+            for row in group]
+
+    bits = [[bytearray((len(rows) + 7) // 8) for _ in range(size + 1)] for _ in range(size)]
+    for index, row in enumerate(rows):
+        byte = index >> 3
+        bit = 1 << (index & 7)
+        for position, value in enumerate(row):
+            bits[position][value][byte] |= bit
+
+    supports = tuple(tuple(int.from_bytes(b, 'little') for b in position) for position in bits)
+
+    return len(rows), supports
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+try:
+    import sqlalchemy as sql
+    from collector import Collector
+except ImportError:
+    sql = None
+
+
+@unittest.skipIf(sql is None, 'sqlalchemy is not installed')
+class SqliteCollectorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.directory.name, 'scp')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def count_rows(self):
+        engine = sql.create_engine(f'sqlite:///{self.db_name}.db')
+        try:
+            with engine.connect() as connection:
+                return connection.execute(sql.text('SELECT COUNT(*) FROM tests')).scalar()
+        finally:
+            engine.dispose()
+
+    def test_rows_are_written_in_batches(self):
+        with Collector(self.db_name, backend='sqlite', batch_size=3) as collector:
+            for i in range(10):
+                collector.push_data(f'futo_4_{i}', 0.1, i, 2 * i, 'back', 'none', False)
+
+        self.assertEqual(self.count_rows(), 10)
+
+    def test_failed_write_is_raised(self):
+        with self.assertRaises(sql.exc.SQLAlchemyError):
+            with Collector(self.db_name, backend='sqlite') as collector:
+                with collector.engine.begin() as connection:
+                    connection.execute(sql.text('DROP TABLE tests'))
+                collector.push_data('futo_4_0', 0.1, 1, 2, 'back', 'none', False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from scp import SCP
+
+# Skyscrapper boards whose solutions were lost by backjumping over levels pruning non-locally
+BACKJUMPING_BOARDS = [
+    ('5\nG;0;0;3;0;0\nD;3;2;0;0;0\nL;2;0;1;0;3\nP;0;0;3;0;0\n', 457),
+    ('5\nG;2;0;1;0;2\nD;4;0;3;1;0\nL;0;0;2;0;0\nP;0;0;0;0;0\n', 96)
+]
+
+
+def count_solutions(text, type_, **configuration):
+    """
+    Count all solutions of puzzle given as file content
+
+    :param text:            File content
+    :param type_:           Type of problem, futo or sky
+    :param configuration:   Parameters of SCP
+
+    :return:    Number of solutions
+    """
+    fd, path = tempfile.mkstemp(suffix='.txt', prefix=f'{type_}_')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        scp = SCP(all_solutions=True, count_only=True, **configuration)
+        scp.load_data(path, type_)
+        scp.run()
+        return scp.solutions_num
+    finally:
+        os.remove(path)
+
+
+class BackjumpingTest(unittest.TestCase):
+    def test_forward_checking_keeps_all_solutions(self):
+        for text, expected in BACKJUMPING_BOARDS:
+            for order in ('none', 'min_dom'):
+                with self.subTest(board=text, order=order):
+                    self.assertEqual(count_solutions(text, 'sky', method='forward', order=order, backjumping=True),
+                                     expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,11 @@
-from time import time
+from time import perf_counter
 
 
 def timeit(func):
     def wrapper(*args, **kwargs):
-        s_time = time()
+        s_time = perf_counter()
         result = func(*args, **kwargs)
-        e_time = time()
+        e_time = perf_counter()
 
         delta = e_time - s_time
         print(f'Executed in {delta}s')
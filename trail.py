@@ -0,0 +1,15 @@
+def count_removed(trail, position):
+    """
+    Count values removed from domains since given trail position
+
+    :param trail:       Solver trail of pairs (variable, old domain)
+    :param position:    Trail length before the change
+
+    :return:    Number of removed values
+    """
+    # Domain recorded first for every variable is the one from before the change
+    old_domains = dict()
+    for var, domain in trail[position:]:
+        old_domains.setdefault(var, domain)
+
+    return sum(domain.bit_count() - var.domain.bit_count() for var, domain in old_domains.items())